@@ -0,0 +1,103 @@
+"""Generates synthetic tracking spreadsheets based on base_file.xlsx
+
+python benchmarks/generate.py 1000 10000 100000
+
+Files are written to benchmarks/data/portfolio_<rows>_<unique items>.xlsx and reused by benchmarks/run.py
+"""
+
+import os
+import sys
+import random
+from copy import copy
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from openpyxl import load_workbook  # noqa: E402
+
+import config  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+WEAPONS = ["AK-47", "M4A4", "M4A1-S", "AWP", "Desert Eagle", "USP-S", "Glock-18", "P250", "MP9", "Nova"]
+WEARS = ["Factory New", "Minimal Wear", "Field-Tested", "Well-Worn", "Battle-Scarred"]
+
+
+def synthetic_catalog(unique_items=2000, seed=730):
+    """
+
+    Builds a deterministic catalogue of synthetic items shared by the spreadsheets and the mock price servers
+
+    roughly 80% of items are weapon skins with a wear, the rest are cases without one
+
+    :returns: list of (item, condition, USD price), condition is None for items without a wear
+
+    """
+
+    rng = random.Random(seed)
+    catalog = []
+
+    for i in range(unique_items):
+        price = round(rng.lognormvariate(0, 1.5), 2)
+
+        if i % 5 == 4:
+            catalog.append((f"Bench Case {i}", None, price))
+        else:
+            catalog.append((f"{WEAPONS[i % len(WEAPONS)]} | Bench Skin {i}", WEARS[i % len(WEARS)], price))
+
+    return catalog
+
+
+def market_hash_name(item, condition):
+    return item if condition is None else f"{item} ({condition})"
+
+
+def generate(rows, unique_items=2000, seed=730):
+    """
+
+    Writes a spreadsheet of rows items drawn from the synthetic catalogue, styled like rows written by inventory.py
+
+    About 1 in 50 rows has a misspelt item name (not in any price source) and 1 in 10 has been sold
+
+    :returns: path of the spreadsheet
+
+    """
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"portfolio_{rows}_{unique_items}.xlsx")
+
+    if os.path.exists(path):
+        return path
+
+    rng = random.Random(seed + rows)
+    catalog = synthetic_catalog(unique_items, seed)
+
+    wb = load_workbook(os.path.join(REPO_DIR, config.base_path))
+    ws = wb.active
+    row_styles = [copy(cell._style) for cell in ws[1][:10]]
+
+    for row in range(2, rows + 2):
+        item, condition, price = rng.choice(catalog)
+
+        if rng.random() < 0.02:
+            item = item + " Typo"
+
+        purchase_price = round(price * rng.uniform(0.5, 1.5), 2)
+        sold_price = round(price * rng.uniform(0.8, 1.2), 2) if rng.random() < 0.1 else "N/A"
+
+        values = ["01/01/2024", item, condition, "Steam", purchase_price, purchase_price, 0.0,
+                  f"=F{row}-E{row}", sold_price, "n"]
+
+        for column, (value, style) in enumerate(zip(values, row_styles), start=1):
+            cell = ws.cell(row=row, column=column, value=value)
+            cell._style = copy(style)
+
+    wb.save(path)
+
+    return path
+
+
+if __name__ == "__main__":
+
+    for size in sys.argv[1:] or ["1000", "10000", "100000"]:
+        print(generate(int(size)))
@@ -0,0 +1,96 @@
+"""Offline check of the price history window metrics (price_history.window_metrics) in several time zones
+
+python benchmarks/history_metrics.py --timezones UTC Australia/Sydney America/Los_Angeles
+
+For each time zone a fresh process (TZ set in its environment) stores a synthetic history of one fetch per day over the
+last 31 days, at a fixed local time early and late in the day, with every price doubling from one day to the next.
+The metrics must then be the same whatever the time zone:
+
+- change_1d / change_7d / change_30d of 1, 127 and 2^30 - 1
+- min_30d / max_30d of the prices 30 days ago and today, a volatility_30d of 0
+- the same metrics once the past days are compacted into one file per day
+
+The script exits with an error message on the first check that fails.
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+DAYS = 30
+ITEMS = ["AK-47 | Redline (Field-Tested)", "AWP | Asiimov (Battle-Scarred)"]
+
+
+def check(condition, message):
+    if not condition:
+        sys.exit(f"FAILED: {message}")
+
+
+def check_metrics(metrics, label):
+    """Checks the metrics of a history whose prices double every day"""
+
+    expected = {"change_1d": 1, "change_7d": 2 ** 7 - 1, "change_30d": 2 ** 30 - 1, "min_30d": 1, "max_30d": 2 ** 30,
+                "volatility_30d": 0}
+
+    check(sorted(metrics.index) == sorted(ITEMS), f"{label}: metrics of {list(metrics.index)}")
+
+    for name in ITEMS:
+        for column, value in expected.items():
+            check(abs(metrics.loc[name, column] - value) < 1e-9,
+                  f"{label}: {column} of {name} is {metrics.loc[name, column]} instead of {value}")
+
+
+def run_child(hour):
+    """Stores a history fetched every day at hour (local time) in a temporary directory and checks its metrics"""
+
+    import config
+    import price_history
+
+    work_dir = tempfile.mkdtemp(prefix="cs2_history_")
+    config.price_history_dir = work_dir
+    today = datetime.now().replace(hour=hour, minute=30, second=0, microsecond=0)
+
+    try:
+        for offset in range(DAYS, -1, -1):
+            price = 2.0 ** (DAYS - offset)
+            price_history.append(dict.fromkeys(ITEMS, price), "a", "GBP", when=today - timedelta(days=offset))
+
+        label = f"TZ={os.environ.get('TZ', '')} fetched at {hour}:30"
+        check_metrics(price_history.window_metrics("a", "GBP", now=today), label)
+
+        price_history.compact("a", "GBP", today=today)
+        check_metrics(price_history.window_metrics("a", "GBP", now=today), f"{label}, compacted")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timezones", nargs="+", default=["UTC", "Australia/Sydney", "America/Los_Angeles"])
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        return run_child(args.child)
+
+    for timezone in args.timezones:
+        for hour in (0, 23):
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(hour)],
+                                    env={**os.environ, "TZ": timezone})
+
+            if result.returncode:
+                sys.exit(result.returncode)
+
+        print(f"{timezone:<24} ok")
+
+
+if __name__ == "__main__":
+    main()
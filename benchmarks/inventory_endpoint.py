@@ -0,0 +1,206 @@
+"""Offline check and benchmark of the inventory JSON endpoint path (steam_inventory.fetch_inventory) on a local mock
+
+python benchmarks/inventory_endpoint.py --items 1000 5000 --page-size 500
+
+A mock /inventory/<SteamID64>/730/2 endpoint serves a synthetic inventory in pages of count items, continued with
+start_assetid and marked with more_items / last_assetid like Steam's. Several assets share a description (joined by
+classid / instanceid) and every 7th item is not marketable. For each size the inventory is fetched and checked:
+
+- every asset is read once, in inventory order, with one request per page
+- each item has the name, condition and marketability of its own description
+- inventory.collect_marketable_items keeps exactly the marketable items
+- the same items are parsed when they are described from a warm item catalog
+- a custom profile URL is resolved to its SteamID64, a private inventory raises InventoryUnavailableError and pages
+  answered with error 429 are retried through a token bucket
+
+The script exits with an error message on the first check that fails, items per second is reported otherwise.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from mock_servers import MockServer  # noqa: E402
+from inventory_snapshot import synthetic_description  # noqa: E402
+
+STEAM_ID = "76561198000000000"
+PRIVATE_STEAM_ID = "76561198000000001"
+CUSTOM_URL = "bench_user"
+DISTINCT_DESCRIPTIONS = 300
+
+
+def inventory_routes(items):
+    """
+
+    :returns: mock server routes of an inventory of items items: the paged inventory endpoint, a private inventory and
+    the profile XML of CUSTOM_URL
+
+    Asset i has assetid 10^10 + i and description i % DISTINCT_DESCRIPTIONS (synthetic_description)
+
+    """
+
+    assets = [{"appid": 730, "contextid": "2", "assetid": str(10 ** 10 + i),
+               "classid": str(i % DISTINCT_DESCRIPTIONS), "instanceid": "0", "amount": "1"} for i in range(items)]
+    positions = {asset["assetid"]: position for position, asset in enumerate(assets)}
+
+    def inventory_page(query, headers):
+        count = int(query.get("count", ["75"])[0])
+        start = positions[query["start_assetid"][0]] + 1 if "start_assetid" in query else 0
+        page = assets[start:start + count]
+        classids = dict.fromkeys(asset["classid"] for asset in page)
+
+        data = {
+            "assets": page,
+            "descriptions": [{"classid": classid, "instanceid": "0", **synthetic_description(int(classid))}
+                             for classid in classids],
+            "total_inventory_count": items,
+            "success": 1,
+            "rwgrsn": -2,
+        }
+
+        if start + count < items:
+            data |= {"more_items": 1, "last_assetid": page[-1]["assetid"]}
+
+        return 200, {"Content-Type": "application/json"}, json.dumps(data).encode()
+
+    def profile(query, headers):
+        return 200, {"Content-Type": "text/xml"}, f"<profile><steamID64>{STEAM_ID}</steamID64></profile>".encode()
+
+    return {
+        f"/inventory/{STEAM_ID}/730/2": inventory_page,
+        f"/inventory/{PRIVATE_STEAM_ID}/730/2": lambda query, headers: (403, {}, b"null"),
+        f"/id/{CUSTOM_URL}/": profile,
+    }
+
+
+def expected_items(items):
+    """:returns: list of (assetid, name, condition, marketable) of the synthetic inventory, in inventory order"""
+
+    expected = []
+
+    for i in range(items):
+        description = synthetic_description(i % DISTINCT_DESCRIPTIONS)
+        name, wear = description["market_hash_name"], None
+
+        for tag in description["tags"]:
+            if tag["category"] == "Exterior":
+                wear = tag["localized_tag_name"]
+
+        condition = wear or ""
+        name = name[:-len(wear) - 3] if wear else name
+        expected.append((str(10 ** 10 + i), name, condition, description["marketable"] == 1))
+
+    return expected
+
+
+def unpaced_bucket():
+    """:returns: token bucket which does not pace the pages (without one, pages are half a second apart)"""
+
+    from rate_limiter import TokenBucket
+
+    return TokenBucket(rate=1000, max_rate=1000)
+
+
+def check(condition, message):
+    if not condition:
+        sys.exit(f"FAILED: {message}")
+
+
+def check_inventory(items, page_size):
+    """Fetches a synthetic inventory from the mock endpoint, checks the items and returns the seconds taken"""
+
+    from item_catalog import ItemCatalog
+    from steam_inventory import fetch_inventory
+    from inventory import collect_marketable_items
+
+    server = MockServer(inventory_routes(items))
+
+    try:
+        start = time.perf_counter()
+        fetched = fetch_inventory(STEAM_ID, base_url=server.url, page_size=page_size, bucket=unpaced_bucket())
+        elapsed = time.perf_counter() - start
+
+        expected = expected_items(items)
+        parsed = [(item["assetid"], item["name"], item["condition"], item["marketable"]) for item in fetched]
+
+        check(len(parsed) == items, f"{items} items: {len(parsed)} read")
+        check(parsed == expected, f"{items} items: items differ from the inventory (order, join or wear split)")
+        check(server.requests == -(-items // page_size),
+              f"{items} items: {server.requests} requests for {-(-items // page_size)} pages")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            marketable = collect_marketable_items(fetched, start)
+
+        check([item["assetid"] for item in marketable] == [assetid for assetid, _, _, ok in expected if ok],
+              f"{items} items: marketable filter kept the wrong items")
+
+        catalog = ItemCatalog(":memory:")
+        fetch_inventory(STEAM_ID, base_url=server.url, page_size=page_size, bucket=unpaced_bucket(), catalog=catalog)
+        described = fetch_inventory(STEAM_ID, base_url=server.url, page_size=page_size, bucket=unpaced_bucket(),
+                                    catalog=catalog)
+        catalog.close()
+
+        check(described == fetched, f"{items} items: items described from the catalog differ")
+    finally:
+        server.stop()
+
+    return elapsed
+
+
+def check_accounts():
+    """Checks the custom URL lookup, a private inventory and the retries of rate limited pages"""
+
+    from rate_limiter import TokenBucket
+    from steam_inventory import resolve_steam_id, fetch_inventory, InventoryUnavailableError
+
+    server = MockServer(inventory_routes(120))
+
+    try:
+        steam_id = resolve_steam_id(f"https://steamcommunity.com/id/{CUSTOM_URL}/inventory/", base_url=server.url)
+        check(steam_id == STEAM_ID, f"custom URL resolved to {steam_id}")
+
+        try:
+            fetch_inventory(PRIVATE_STEAM_ID, base_url=server.url, bucket=unpaced_bucket())
+            check(False, "private inventory did not raise InventoryUnavailableError")
+        except InventoryUnavailableError:
+            pass
+    finally:
+        server.stop()
+
+    # two pages a second accepted, requested at ten a second: pages answered 429 are retried after Retry-After
+    server = MockServer(inventory_routes(120), rate=2, retry_after=0.2)
+
+    try:
+        fetched = fetch_inventory(STEAM_ID, base_url=server.url, page_size=20, bucket=TokenBucket(rate=10))
+        check(len(fetched) == 120 and server.rate_limited > 0,
+              f"rate limited inventory: {len(fetched)}/120 items, {server.rate_limited} pages answered 429")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 5000], help="synthetic inventory sizes")
+    parser.add_argument("--page-size", type=int, default=500, help="items requested per page")
+    args = parser.parse_args()
+
+    check_accounts()
+    print("custom URL, private inventory and rate limited pages: ok")
+
+    for items in args.items:
+        elapsed = check_inventory(items, args.page_size)
+        pages = -(-items // args.page_size)
+        print(f"{items:>7} items  {pages:>4} pages  {elapsed:7.2f}s  {items / elapsed:8.0f} items/s  ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Offline benchmark of the Selenium inventory path's page snapshot parsing (steam_inventory.parse_inventory_snapshot)
+
+python benchmarks/inventory_snapshot.py --items 1000 5000
+python benchmarks/inventory_snapshot.py --snapshot saved_snapshot.json
+
+Every snapshot saved in benchmarks/fixtures/ (<name>.json) is first parsed and checked against the items it must give
+(<name>.expected.json: the item dictionaries, whether the last page was reached and the number of unread slots), the
+script exits with an error message if one differs. A snapshot saved from another inventory page is checked by adding
+it there with its expected items.
+
+Synthetic snapshots are built in the shape returned by steam_inventory.INVENTORY_SNAPSHOT_SCRIPT (pages of 25 item
+slots, the last page padded with empty slots, the next page button) and parsed page by page the way
+inventory.scrape_inventory does, one page being built per snapshot. The parsed items are checked against the generated
+ones and items per second is reported.
+
+--snapshot parses a snapshot saved from a real inventory page, i.e. the JSON of
+driver.execute_script(INVENTORY_SNAPSHOT_SCRIPT, 0) ({"html": ..., "descriptions": ..., "pages": ...}).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+sys.path.insert(0, REPO_DIR)
+
+from steam_inventory import parse_inventory_snapshot  # noqa: E402
+
+STEAM_ID = "76561198000000000"
+PAGE_SIZE = 25
+WEARS = ["Factory New", "Minimal Wear", "Field-Tested", "Well-Worn", "Battle-Scarred"]
+
+
+def synthetic_description(i):
+    """:returns: description of the i-th synthetic item, every 5th item is a case (no wear), every 7th not marketable"""
+
+    if i % 5 == 4:
+        market_hash_name, tags = f"Bench Case {i}", [("Type", "Container"), ("Quality", "Normal"),
+                                                    ("Rarity", "Base Grade")]
+    else:
+        wear = WEARS[i % len(WEARS)]
+        market_hash_name = f"AK-47 | Bench Skin {i} ({wear})"
+        tags = [("Type", "Rifle"), ("Quality", "Normal"), ("Rarity", "Classified"), ("Exterior", wear)]
+
+    return {
+        "market_hash_name": market_hash_name,
+        "marketable": 0 if i % 7 == 6 else 1,
+        "tags": [{"category": category, "localized_tag_name": name} for category, name in tags],
+    }
+
+
+def synthetic_snapshot(items, built, first_page):
+    """:returns: snapshot of pages first_page to built of an inventory of items items, as the snapshot script"""
+
+    total_pages = -(-items // PAGE_SIZE)
+    page_html = []
+
+    for page in range(first_page, built):
+        slots = []
+
+        for i in range(page * PAGE_SIZE, (page + 1) * PAGE_SIZE):
+            if i < items:
+                slots.append(f'<div class="itemHolder"><div class="item app730 context2" id="730_2_{10 ** 10 + i}">'
+                             f'<img src="https://community.akamai.steamstatic.com/economy/image/{i}/96fx96f">'
+                             f'<a href="#730_2_{10 ** 10 + i}" class="inventory_item_link"></a></div></div>')
+            else:
+                slots.append('<div class="itemHolder disabled"></div>')
+
+        style = "" if page == built - 1 else ' style="display: none;"'
+        page_html.append(f'<div class="inventory_page"{style}>{"".join(slots)}</div>')
+
+    next_class = "pagebtn disabled" if built == total_pages else "pagebtn"
+    html = (f'<div id="inventory_{STEAM_ID}_730_2">{"".join(page_html)}</div>'
+            f'<a id="pagebtn_next" class="{next_class}">&gt;</a>')
+    descriptions = {str(10 ** 10 + i): synthetic_description(i)
+                    for i in range(first_page * PAGE_SIZE, min(items, built * PAGE_SIZE))}
+
+    return {"html": html, "descriptions": descriptions, "pages": built}
+
+
+def parse_pages(next_snapshot):
+    """
+
+    Parses snapshots like inventory.scrape_inventory
+
+    next_snapshot: function of the first page to snapshot returning the next snapshot
+
+    :returns: (items, number of snapshots, seconds taken)
+
+    """
+
+    items, seen, first_page, snapshots = [], set(), 0, 0
+    start = time.perf_counter()
+
+    while True:
+        snapshot = next_snapshot(first_page)
+        snapshots += 1
+        page_items, last_page, unread = parse_inventory_snapshot(snapshot["html"], snapshot["descriptions"], seen)
+
+        if unread:
+            sys.exit(f"{unread} item slots of a snapshot could not be read")
+
+        items += page_items
+        seen.update(item["assetid"] for item in page_items)
+        first_page = max(snapshot["pages"] - 1, 0)
+
+        if last_page:
+            return items, snapshots, time.perf_counter() - start
+
+
+def check_fixtures():
+    """Parses the snapshots saved in FIXTURE_DIR and checks them against their expected items"""
+
+    for file in sorted(os.listdir(FIXTURE_DIR)):
+        if not file.endswith(".expected.json"):
+            continue
+
+        with open(os.path.join(FIXTURE_DIR, file), encoding="utf-8") as f:
+            expected = json.load(f)
+        with open(os.path.join(FIXTURE_DIR, file.replace(".expected.json", ".json")), encoding="utf-8") as f:
+            snapshot = json.load(f)
+
+        items, last_page, unread = parse_inventory_snapshot(snapshot["html"], snapshot["descriptions"])
+
+        for position, (item, expected_item) in enumerate(zip(items, expected["items"])):
+            if item != expected_item:
+                sys.exit(f"FAILED: {file}: item {position + 1} parsed as {item}, expected {expected_item}")
+
+        if len(items) != len(expected["items"]):
+            sys.exit(f"FAILED: {file}: {len(items)} items parsed, expected {len(expected['items'])}")
+        if (last_page, unread) != (expected["last_page"], expected["unread"]):
+            sys.exit(f"FAILED: {file}: last page {last_page} with {unread} unread slots, expected "
+                     f"{expected['last_page']} with {expected['unread']}")
+
+        print(f"{file.replace('.expected.json', '.json')}: {len(items)} items ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[1000], help="synthetic inventory sizes")
+    parser.add_argument("--snapshot", metavar="PATH", help="saved snapshot JSON to parse instead")
+    args = parser.parse_args()
+
+    check_fixtures()
+
+    if args.snapshot:
+        with open(args.snapshot) as f:
+            snapshot = json.load(f)
+
+        items, _, elapsed = parse_pages(lambda first_page: snapshot)
+        print(f"{args.snapshot}: {len(items)} items in {elapsed:.3f}s ({len(items) / elapsed:.0f} items/s)")
+        return
+
+    for count in args.items:
+        # snapshots are built up front so only parsing is timed, each starts at the last page of the one before
+        snapshots = iter([synthetic_snapshot(count, built, max(built - 2, 0))
+                          for built in range(1, -(-count // PAGE_SIZE) + 1)])
+
+        items, snapshot_count, elapsed = parse_pages(lambda first_page: next(snapshots))
+
+        expected = [str(10 ** 10 + i) for i in range(count)]
+        if [item["assetid"] for item in items] != expected:
+            sys.exit(f"{count} items: parsed items do not match the snapshot")
+
+        print(f"{count:>7} items  {snapshot_count:>4} snapshots  {elapsed:7.2f}s  {count / elapsed:8.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Local mock HTTP servers for the price sources used by cs2.py
+
+Each server counts the requests it receives and can add latency to every response. The Steam server can also enforce a
+request rate, answering with error 429 and a Retry-After header when it is exceeded, like the real endpoint.
+"""
+
+import json
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from generate import synthetic_catalog, market_hash_name
+
+
+class MockServer:
+    """
+
+    A price source served from a background thread
+
+    routes: dictionary of path -> function(query, request headers) returning (status, headers, body bytes)
+    latency: seconds added to every response
+    rate: requests per second accepted before answering 429, None for no limit
+
+    """
+
+    def __init__(self, routes, latency=0.0, rate=None, retry_after=1):
+        self.routes = routes
+        self.latency = latency
+        self.rate = rate
+        self.retry_after = retry_after
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.allowance = rate or 0
+        self.last_check = time.monotonic()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, headers, body = server.handle(self.path, self.headers)
+                time.sleep(server.latency)
+
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def handle(self, path, headers):
+        url = urlparse(path)
+
+        with self.lock:
+            self.requests += 1
+
+            if self.rate is not None and not self.allow():
+                self.rate_limited += 1
+                return 429, {"Retry-After": str(self.retry_after)}, b""
+
+        if url.path not in self.routes:
+            return 404, {}, b""
+
+        status, response_headers, body = self.routes[url.path](parse_qs(url.query), headers)
+
+        with self.lock:
+            self.bytes_sent += len(body)
+
+        return status, response_headers, body
+
+    def allow(self):
+        """Server side token bucket deciding whether a request is within the accepted rate"""
+
+        now = time.monotonic()
+        self.allowance = min(self.rate, self.allowance + (now - self.last_check) * self.rate)
+        self.last_check = now
+
+        if self.allowance < 1:
+            return False
+
+        self.allowance -= 1
+        return True
+
+    def reset(self):
+        with self.lock:
+            self.requests = self.rate_limited = self.bytes_sent = 0
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+def json_response(data):
+    body = json.dumps(data).encode()
+    return lambda query, headers: (200, {"Content-Type": "application/json"}, body)
+
+
+def start_mock_servers(unique_items=2000, latency=0.0, steam_rate=None):
+    """
+
+    Starts mock servers for the Steam priceoverview endpoint, the CSFloat price-list, the CSGO Trader prices_v6 feed and
+    the exchange rates endpoint, all serving prices of the synthetic catalogue
+
+    :returns: dictionary of source name -> MockServer
+
+    """
+
+    prices = {market_hash_name(item, condition): price for item, condition, price in synthetic_catalog(unique_items)}
+
+    def steam_price(query, headers):
+        price = prices.get(query.get("market_hash_name", [""])[0])
+
+        if price is None:
+            return 200, {}, json.dumps({"success": False}).encode()
+
+        data = {"success": True, "lowest_price": f"£{price * 0.8:,.2f}", "volume": "10",
+                "median_price": f"£{price * 0.8:,.2f}"}
+        return 200, {}, json.dumps(data).encode()
+
+    cs_float = [{"market_hash_name": name, "qty": 10, "min_price": int(price * 100)} for name, price in prices.items()]
+
+    cs_trader = {name: {"steam": {"last_24h": price, "last_7d": price, "last_30d": price, "last_90d": price},
+                        "skinport": {"suggested_price": price, "starting_at": price},
+                        "buff163": {"starting_at": {"price": None}, "highest_order": {"price": None}}}
+                 for name, price in prices.items()}
+
+    fx_rates = {"result": "success", "base_code": "USD", "rates": {"USD": 1, "GBP": 0.7812, "EUR": 0.9213}}
+
+    return {
+        "steam": MockServer({"/market/priceoverview/": steam_price}, latency, steam_rate),
+        "cs_float": MockServer({"/api/v1/listings/price-list": json_response(cs_float)}, latency),
+        "cs_trader": MockServer({"/latest/prices_v6.json": json_response(cs_trader)}, latency),
+        "fx": MockServer({"/v6/latest/USD": json_response(fx_rates)}, latency),
+    }
+
+
+def configure_endpoints(servers):
+    """Points the price source endpoints in config at the mock servers"""
+
+    import config
+
+    config.steam_market_url = f"{servers['steam'].url}/market/priceoverview/"
+    config.cs_float_price_list_url = f"{servers['cs_float'].url}/api/v1/listings/price-list"
+    config.cs_trader_prices_url = f"{servers['cs_trader'].url}/latest/prices_v6.json"
+    config.fx_rates_url = f"{servers['fx'].url}/v6/latest/USD"
@@ -0,0 +1,151 @@
+"""Offline benchmark of cs2.py update options against synthetic spreadsheets and local mock price servers
+
+python benchmarks/run.py --rows 1000 10000 --options a b e --latency 0.05 --steam-rate 20 --output results.json
+python benchmarks/run.py --rows 100000 --options e --store
+
+Every (rows, option) pair is run twice in a fresh process with its own price cache and feed snapshot directory:
+"cold" with empty caches and "warm" straight after. Wall time, peak memory and requests made are recorded per run.
+
+--store keeps the portfolio in a portfolio store (portfolio_store_path) instead of the spreadsheet, the cold run imports
+the spreadsheet into it and the warm run reads and writes the store only.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+
+def run_child(option, spreadsheet, work_dir, endpoints, store=False):
+    """Runs cs2.py once in this process with its output silenced and prints the measurements as JSON"""
+
+    import io
+    import runpy
+    import contextlib
+
+    import config
+
+    for key, value in endpoints.items():
+        setattr(config, key, value)
+
+    config.file_path_local = spreadsheet
+    config.file_path_desktop = None
+    config.price_cache_path = os.path.join(work_dir, "price_cache.sqlite")
+    config.feed_snapshot_dir = os.path.join(work_dir, "feed_snapshots")
+    config.fx_cache_path = os.path.join(work_dir, "fx_rates.json")
+    config.journal_path = os.path.join(work_dir, "reprice_journal.jsonl")
+    config.item_catalog_path = os.path.join(work_dir, "item_catalog.sqlite")
+    config.price_history_dir = os.path.join(work_dir, "price_history")
+    config.portfolio_store_path = os.path.join(work_dir, "portfolio.sqlite") if store else None
+    sys.argv = [os.path.join(REPO_DIR, "cs2.py"), "--option", option]
+
+    start = time.perf_counter()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        runpy.run_path(os.path.join(REPO_DIR, "cs2.py"), run_name="__main__")
+
+    wall_time = time.perf_counter() - start
+
+    try:
+        import resource
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        peak_memory = None
+
+    print(json.dumps({"wall_time": wall_time, "peak_memory": peak_memory}))
+
+
+def run_benchmark(rows, unique_items, option, servers, endpoints, work_dir, label, store=False):
+    """Runs one option on a copy of the synthetic spreadsheet in a child process and collects the measurements"""
+
+    from generate import generate
+
+    spreadsheet = os.path.join(work_dir, "portfolio.xlsx")
+    shutil.copy(generate(rows, unique_items), spreadsheet)
+
+    for server in servers.values():
+        server.reset()
+
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", option, spreadsheet, work_dir, json.dumps(endpoints),
+         json.dumps(store)],
+        capture_output=True, text=True, cwd=REPO_DIR
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(f"option {option} on {rows} rows failed:\n{result.stderr}")
+
+    measurements = json.loads(result.stdout.strip().splitlines()[-1])
+
+    return {
+        "rows": rows,
+        "option": option,
+        "run": label,
+        **measurements,
+        "requests": sum(server.requests for server in servers.values()),
+        "rate_limited": sum(server.rate_limited for server in servers.values()),
+        "bytes": sum(server.bytes_sent for server in servers.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--options", nargs="+", default=["a", "b", "c", "d", "e"])
+    parser.add_argument("--unique-items", type=int, default=2000, help="size of the synthetic item catalogue")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every mock response")
+    parser.add_argument("--steam-rate", type=float, default=None, help="Steam requests/s accepted before 429")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--store", action="store_true", help="keep the portfolio in a portfolio store")
+    args = parser.parse_args()
+
+    from mock_servers import start_mock_servers, configure_endpoints
+
+    import config
+
+    servers = start_mock_servers(args.unique_items, args.latency, args.steam_rate)
+    configure_endpoints(servers)
+    endpoints = {key: getattr(config, key) for key in
+                 ("steam_market_url", "cs_float_price_list_url", "cs_trader_prices_url", "fx_rates_url")}
+
+    results = []
+    print(f"{'rows':>8} {'option':>6} {'run':>5} {'wall (s)':>9} {'peak (MB)':>10} {'requests':>9} {'429s':>5} "
+          f"{'MB sent':>8}")
+
+    for rows in args.rows:
+        for option in args.options:
+            work_dir = tempfile.mkdtemp(prefix="cs2_benchmark_")
+
+            try:
+                for label in ("cold", "warm"):
+                    result = run_benchmark(rows, args.unique_items, option, servers, endpoints, work_dir, label,
+                                           args.store)
+                    results.append(result)
+
+                    peak = f"{result['peak_memory'] / 1e6:.0f}" if result["peak_memory"] else "-"
+                    print(f"{rows:>8} {option:>6} {label:>5} {result['wall_time']:>9.2f} {peak:>10} "
+                          f"{result['requests']:>9} {result['rate_limited']:>5} {result['bytes'] / 1e6:>8.2f}")
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3], sys.argv[4], json.loads(sys.argv[5]), json.loads(sys.argv[6]))
+    else:
+        main()
@@ -0,0 +1,90 @@
+"""Start-up time benchmark of cs2.py and inventory.py based on python -X importtime
+
+python benchmarks/startup.py --runs 5 --max-ms 1500
+
+Each module is imported in a fresh interpreter runs times. The median import time of the module and of its slowest
+direct imports is reported, along with whether modules that should only load on demand (Selenium, chromedriver
+installer, BeautifulSoup, requests) were imported. With --max-ms the exit code is 1 if any module takes longer.
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["cs2", "inventory"]
+ON_DEMAND = ["selenium", "chromedriver_autoinstaller", "bs4", "requests", "cProfile"]
+
+
+def import_times(module):
+    """
+
+    Imports module in a fresh interpreter with -X importtime
+
+    :returns: dictionary of imported module name -> (cumulative microseconds, nesting depth)
+
+    """
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=REPO_DIR)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr}")
+
+    times = {}
+
+    # import time: self [us] | cumulative | imported package (indented two spaces per nesting level)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times[name.strip()] = (int(cumulative), depth)
+
+    return times
+
+
+def benchmark(module, runs):
+    """:returns: median import time of module (ms), median times of its direct imports (ms), on demand modules loaded"""
+
+    samples = [import_times(module) for _ in range(runs)]
+
+    total = statistics.median(sample[module][0] for sample in samples) / 1000
+    direct = {name: statistics.median(sample[name][0] for sample in samples if name in sample) / 1000
+              for name, (_, depth) in samples[0].items() if depth == 1}
+    loaded = [name for name in ON_DEMAND if name in samples[0]]
+
+    return total, direct, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="number of slowest direct imports listed per module")
+    parser.add_argument("--max-ms", type=float, help="fail if a module takes longer than this to import")
+    args = parser.parse_args()
+
+    failed = False
+
+    for module in MODULES:
+        total, direct, loaded = benchmark(module, args.runs)
+        print(f"{module:<12} {total:8.1f} ms")
+
+        for name, ms in sorted(direct.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"  {name:<24} {ms:8.1f} ms")
+
+        print(f"  on demand modules imported: {', '.join(loaded) or 'none'}\n")
+
+        if args.max_ms is not None and total > args.max_ms:
+            print(f"{module} import time {total:.1f} ms is over the {args.max_ms:.0f} ms limit\n")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
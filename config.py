@@ -2,3 +2,87 @@ base_path = 'base_file.xlsx'  # template file
 file_path_local = '<file_name>.xlsx'  # output file in same directory as scripts
 file_path_desktop = None  # file output to desktop (if you want to) e.g., r'<path_to_desktop>/<file_name>.xlsx'
 chrome_driver_executable_path = None  # full path to chromedriver executable if driver not found
+
+# Steam live price fetching [cs2.py option A]
+steam_max_workers = 4  # number of concurrent requests to the Steam endpoint
+steam_initial_rate = 1.0  # starting requests per second, adjusted automatically on error 429
+steam_max_retries = 5  # times a rate limited (or failed) item is retried before being marked as not updated
+
+# Persistent price cache [cs2.py]
+price_cache_path = 'price_cache.sqlite'  # SQLite file storing prices between runs
+price_cache_mode = 'stale'  # 'stale': only fetch missing/expired prices, 'cache': never fetch, 'refresh': fetch all prices
+price_cache_ttl = {  # seconds a cached price stays fresh for each option
+    'a': 60 * 60,
+    'b': 8 * 60 * 60,
+    'c': 8 * 60 * 60,
+    'd': 8 * 60 * 60,
+    'e': 60 * 60,
+}
+price_cache_max_age = 30 * 24 * 60 * 60  # cached prices older than this are evicted
+price_cache_max_entries = 100000  # only the most recently fetched prices are kept
+
+# Bulk price feed snapshots [cs2.py options B-E]
+feed_snapshot_dir = 'feed_snapshots'  # directory storing compressed copies of the CSFloat and CSGO Trader feeds
+feed_snapshot_revalidate = {  # seconds a snapshot is used without asking the server whether the feed changed
+    'cs_trader': 60 * 60,
+    'cs_float': 5 * 60,
+}
+
+# Currency and exchange rates [cs2.py]
+currency = 'GBP'  # currency prices are retrieved in (Steam) or converted to from USD (options B-F), e.g. 'USD', 'EUR'
+fx_cache_path = 'fx_rates.json'  # exchange rates of every currency stored on disk
+fx_ttl = 60 * 60  # seconds stored exchange rates are used before they are retrieved again
+
+# Repricing [cs2.py]
+reprice_mode = 'all'  # 'all': reprice every row, 'stale': skip sold rows and rows updated within reprice_window
+reprice_window = 6 * 60 * 60  # seconds a row counts as recently updated in 'stale' mode
+reprice_priority = 'value'  # fetch order of items: 'value' (highest value first), 'volatility' (largest % change first) or None
+
+# Inventory scraping [inventory.py]
+inventory_backend = 'api'  # 'api': Steam inventory JSON endpoint (Selenium used as fallback), 'selenium': browser only
+inventory_page_size = 2000  # items requested per page from the inventory JSON endpoint
+inventory_mode = 'sync'  # 'sync': add new items to / flag removed items in file_path_local, 'rebuild': start from base_path
+inventory_accounts = []  # inventory URLs or SteamID64s to import in parallel (batch mode), prompt for one URL if empty
+inventory_max_workers = 4  # number of accounts imported at the same time in batch mode
+inventory_rate = 1.0  # starting inventory page requests per second shared by all accounts in batch mode
+inventory_write_only = False  # build new spreadsheets in openpyxl write-only mode (very large inventories, not sync or batch)
+
+# Reprice journal [cs2.py]
+journal_path = 'reprice_journal.jsonl'  # prices fetched by the running repricing pass, kept until it is saved (--resume)
+journal_checkpoint_interval = 5 * 60  # seconds between partial saves of the workbook during a Steam fetch, 0 for none
+
+# Price source endpoints [cs2.py] (only change these to point at local mock servers, see benchmarks/)
+steam_market_url = 'https://steamcommunity.com/market/priceoverview/'
+cs_float_price_list_url = 'https://csfloat.com/api/v1/listings/price-list'
+cs_trader_prices_url = 'https://prices.csgotrader.app/latest/prices_v6.json'
+fx_rates_url = 'https://open.er-api.com/v6/latest/USD'
+
+# Price history [cs2.py]
+price_history_dir = 'price_history'  # directory of daily partitions of every successfully fetched price
+price_history_columns = False  # write 24h/7d/30d % change, 30d min/max and 30d volatility columns from the history
+
+# All sources mode [cs2.py option F]
+all_sources = ['a', 'e', 'd']  # source options fetched at the same time, Current Value is taken from the first with a price
+
+# Name resolution [cs2.py options B-F]
+name_resolution = True  # resolve item names missing from a bulk feed (StatTrak™/★ prefix, spacing, wear typos) by similarity
+name_resolution_threshold = 0.85  # lowest similarity (0-1) of a name accepted as a correction
+
+# Portfolio store [cs2.py, inventory.py]
+portfolio_store_path = None  # SQLite file holding the portfolio instead of file_path_local e.g. 'portfolio.sqlite'
+portfolio_render = False  # also generate the styled spreadsheet (file_path_local/file_path_desktop) on every save
+
+# Batch repricing [cs2.py]
+batch_file_paths = []  # spreadsheets repriced together (--batch), each unique item is priced once for all of them
+batch_max_workers = 4  # spreadsheets written and saved at the same time in batch mode
+
+# Item catalog [cs2.py, inventory.py]
+item_catalog_path = 'item_catalog.sqlite'  # SQLite file of the type, weapon, wear, rarity and collection of every item
+item_category_column = False  # write the category of every item (e.g. Rifle, Knife, Sticker) into a 'Category' column
+
+# HTTP transport [cs2.py, inventory.py]
+http_timeout = (5, 30)  # seconds to connect and to wait for a response of every request
+http_max_per_host = 8  # concurrent requests (and pooled keep-alive connections) per host
+http_host_limits = {'steamcommunity.com': 4}  # concurrent requests of particular hosts, overriding http_max_per_host
+http_mode = 'live'  # 'live', 'record': also save the responses to http_cassette_dir, 'replay': serve them offline
+http_cassette_dir = 'cassettes/default'  # directory of the recorded responses (--record/--replay)
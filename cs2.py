@@ -1,20 +1,33 @@
+import os
 import time
 import config
-import requests
+import threading
+import argparse
+import fx
+import metrics
+import price_history
+import http_transport
 import pandas as pd
-from datetime import datetime
-from bs4 import BeautifulSoup
+from functools import partial
+from datetime import datetime, timedelta
 from urllib.parse import quote
-from openpyxl import load_workbook
-
-
-def get_current_item_value_steam(name, ttw=3):
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from price_cache import PriceCache
+from price_journal import PriceJournal
+from item_catalog import ItemCatalog
+from name_index import NameIndex
+from portfolio_store import open_portfolio
+from feed_store import snapshot_freshness, describe_age
+from feed_table import load_table
+from rate_limiter import TokenBucket, RateLimitedError, parse_retry_after
+
+
+def get_current_item_value_steam(name):
     """
 
     Retrieves CS2 item price from Steam endpoint
 
     name: item name
-    ttw (time to wait): to prevent error 429, add wait time between requests
     response: reply from Steam endpoint
 
     response format (successful):
@@ -30,35 +43,30 @@ def get_current_item_value_steam(name, ttw=3):
         "success": false
     }
 
-    total script time ~ ttw * no. unique items (ttw= 0 can be used for < 18 unique items consistently before error 429)
+    raises RateLimitedError on error 429 so the caller can back off and retry the item
     :returns: current Steam market listing price (successful) or False (unsuccessful)
 
     """
-    global rate_limited
-
-    if rate_limited is True:
-        return False
 
     response_data = None
 
     try:
-        link = f"https://steamcommunity.com/market/priceoverview/?currency=2&appid=730&market_hash_name={quote(name)}"
-        response = requests.get(link)
-        time.sleep(ttw)
+        link = (f"{config.steam_market_url}?currency={fx.steam_currency_code(currency)}&appid=730"
+                f"&market_hash_name={quote(name)}")
+        response = http_transport.get(link)
+
+        if response.status_code == 429:
+            raise RateLimitedError(parse_retry_after(response))
 
         if response.ok:
             response_data = response.json()
 
             if response_data["success"] is True:
-                return float(response_data['lowest_price'][1:])
-
-        if response.status_code == 429:
-            rate_limited = True
-            print("Rate Limited!")
+                return fx.parse_steam_price(response_data['lowest_price'])
 
     except KeyError as e:
         if "median_price" in response_data:
-            return float(response_data['median_price'][1:])
+            return fx.parse_steam_price(response_data['median_price'])
 
         print(response_data)
         print("An error occurred [ITEM NOT FOUND]:", e)
@@ -66,10 +74,98 @@ def get_current_item_value_steam(name, ttw=3):
     return False
 
 
-def get_current_item_value_cs_float(name):
+def fetch_steam_price_with_retries(name, bucket, max_retries):
+    """
+
+    Retrieves a single Steam price, waiting on the shared token bucket before every request
+
+    On error 429 the bucket lowers its rate and pauses all workers for the Retry-After window, the item is then retried
+    instead of being dropped, up to max_retries times. A request which fails (timeout, connection error) is retried
+    after 1, 2, 4... seconds within the same max_retries, the item is then marked as not updated.
+
+    """
+
+    import requests
+
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+
+        try:
+            value = get_current_item_value_steam(name)
+        except RateLimitedError as e:
+            bucket.on_rate_limited(e.retry_after)
+            print(f"Rate Limited! Retrying {name} (rate now {bucket.rate:.2f} req/s)")
+            continue
+        except requests.RequestException as e:
+            print(f"Request failed ({e.__class__.__name__}), retrying {name}")
+            metrics.count("steam_request_errors")
+
+            if attempt < max_retries:
+                time.sleep(2 ** attempt)
+            continue
+
+        bucket.on_success()
+        return value
+
+    return False
+
+
+def fetch_steam_prices(names, checkpoint=None):
+    """
+
+    Retrieves Steam prices for all unique item names concurrently
+
+    Requests are spread over a bounded thread pool and paced by an adaptive token bucket which learns the highest rate
+    Steam accepts from its 429 responses. Each price is written to the reprice journal as soon as it arrives.
+
+    checkpoint: optional function called with the prices fetched so far whenever a checkpoint of the workbook is due
+
+    :returns: dictionary of item name -> price (False for items that could not be priced)
+
     """
 
-    Retrieves CS2 item minimum listing price from CSFloat API, prices are returned in cents
+    bucket = TokenBucket(rate=config.steam_initial_rate)
+    prices = {}
+    start = time.perf_counter()
+
+    executor = ThreadPoolExecutor(max_workers=config.steam_max_workers)
+    futures = {executor.submit(fetch_steam_price_with_retries, name, bucket, config.steam_max_retries): name
+               for name in names}
+
+    try:
+        for count, future in enumerate(as_completed(futures), start=1):
+            name = futures[future]
+            prices[name] = future.result()
+            print(f"[{count}/{len(futures)}] {name} -> {prices[name]}")
+
+            if prices[name] is not False:
+                journal.record({name: prices[name]}, "a")
+
+            if checkpoint is not None and journal.checkpoint_due():
+                checkpoint(prices)
+    finally:
+        # if the run is stopped (Ctrl+C) the queued items are cancelled instead of all still being requested, and the
+        # prices of the requests which were already running are journaled so --resume does not fetch them again
+        executor.shutdown(cancel_futures=True)
+
+        for future, name in futures.items():
+            if name not in prices and not future.cancelled() and future.exception() is None \
+                    and future.result() is not False:
+                journal.record({name: future.result()}, "a")
+
+    elapsed = time.perf_counter() - start
+    print(f"\nFetched {len(prices)} Steam prices in {elapsed:.1f}s "
+          f"({len(prices) / elapsed if elapsed else 0:.2f} items/s, final rate {bucket.rate:.2f} req/s)\n")
+
+    return prices
+
+
+def build_price_table_cs_float(names):
+    """
+
+    Looks up names in the price table of the CSFloat API minimum listing prices, prices are returned in cents
+
+    feed format:
 
     {
         "market_hash_name": "10 Year Birthday Sticker Capsule",
@@ -92,30 +188,22 @@ def get_current_item_value_cs_float(name):
         "min_price": 3800
         }
 
-    """
-
-    try:
-
-        price = cs_float_json[name]["min_price"]
+    :returns: Series of item name -> converted price, items without a price are left out
 
-        if price is None:
-            return False
+    """
 
-        value = (float(price) / 100) * float(conversion_rate)
+    prices = pd.Series(cs_float_table.lookup(names, "min_price"), index=names, dtype=float)
 
-        return check_floor(value)
+    return check_floor((prices.dropna() / 100) * conversion_rate)
 
-    except KeyError as e:
-        print("An error occurred:", e)
-        return False
 
-
-def get_current_item_value_cs_trader(name):
+def build_price_table_cs_trader(names, source):
     """
 
-    Retrieves CS2 item price from CSGO Trader (updated every 8 hours)
+    Looks up names in the price table of CSGO Trader (updated every 8 hours), in the field selected by the source option
+    (b, c, d)
 
-    cs_trader_json structure:
+    feed format:
 
     "<item_name>": {
     "steam": {
@@ -138,38 +226,22 @@ def get_current_item_value_cs_trader(name):
         }
     }
 
-    """
-
-    try:
-        price = 0
-
-        if option == "b":
-            price = cs_trader_json[name]["steam"]["last_24h"]
-        elif option == "c":
-            price = cs_trader_json[name]["steam"]["last_7d"]
-        elif option == "d":
-            price = cs_trader_json[name]["skinport"]["suggested_price"]
+    :returns: Series of item name -> converted price, items without a price are left out
 
-        if price is None:
-            return False
-
-        value = float(price) * float(conversion_rate)
+    """
 
-        return check_floor(value)
+    field = {"b": "steam.last_24h", "c": "steam.last_7d", "d": "skinport.suggested_price"}[source]
+    prices = pd.Series(cs_trader_table.lookup(names, field), index=names, dtype=float)
 
-    except KeyError as e:
-        print("An error occurred:", e)
-        return False
+    return check_floor(prices.dropna() * conversion_rate)
 
 
-def check_floor(value):
+def check_floor(values):
     """
-         Steam price floor value
+         Steam price floor value, applied to a whole Series of prices
     """
 
-    if value < 0.03:
-        return 0.03
-    return value
+    return values.clip(lower=0.03)
 
 
 def percentage_change(old_value, new_value):
@@ -177,21 +249,23 @@ def percentage_change(old_value, new_value):
 
     Calculates percentage change between two values
 
-    old_value: previous value of some variable
-    new_value: updated value of some variable
+    old_value: previous value of some variable (or Series of values)
+    new_value: updated value of some variable (or Series of values)
 
     :returns: percentage difference between old and new value (not multiplied by 100 as Excel percentage format does this)
 
     """
 
     # use 0.01 as a placeholder to avoid division by 0 error
-    if old_value == 0:
+    if isinstance(old_value, pd.Series):
+        old_value = old_value.mask(old_value == 0, 0.01)
+    elif old_value == 0:
         old_value = 0.01
 
     return (new_value - old_value) / old_value
 
 
-def calculate_expected_profit():
+def calculate_expected_profit(df):
     """
     Calculates the expected profit in cell L1 given by the formula: =SUMIFS(H:H, I:I, "N/A") * 0.85
 
@@ -201,18 +275,21 @@ def calculate_expected_profit():
 
     Finally, the sum is multiplied by 0.85 to account for Steam selling fees (5% Steam + 10% game fee [CS2])
 
+    df: dataframe of a spreadsheet's item rows
+
     :returns: The expected profit if the items are sold at Steam market value
 
     """
-    return 0.85 * sum([float(current_value_steam.value) - float(purchase_price.value) for
-                       purchase_price, current_value_steam, sold_price in zip(ws['E'][1:], ws['F'][1:], ws['I'][1:]) if
-                       sold_price.value == "N/A"])
+    unsold = df['Sold Price'] == "N/A"
+    difference = pd.to_numeric(df['Current Value [Steam]'][unsold]) - pd.to_numeric(df['Purchase Price'][unsold])
 
+    return 0.85 * float(difference.sum())
 
-def update_dataframe():
+
+def update_dataframe(portfolios):
     """
 
-    Updates dataframe clone of Excel file with new item values
+    Updates the dataframe clones of the spreadsheets with new item values
 
     item: item value as seen in spreadsheet column 'B'
     condition: item value as seen in spreadsheet column 'C'
@@ -221,115 +298,482 @@ def update_dataframe():
     item_name format (skin): "<Weapon> | (<Condition>)"
     item_name format (other): "<Item>"
 
+    The update runs as whole column operations: names are built once, prices are retrieved once per unique name and
+    joined back onto the rows, then % change and the updated flag are computed for all rows at once. With several
+    spreadsheets (--batch) the unique names of all of them are priced together, so an item held in several spreadsheets
+    is only fetched once.
+
+    Only the rows selected by select_rows_to_reprice() are updated, the rest keep their values and flags.
+
+    While Steam prices are fetched (option A), the prices fetched so far are also saved into the spreadsheets every
+    journal_checkpoint_interval seconds (see save_checkpoint).
+
+    portfolios: list of Portfolio
+
     """
 
-    for index, row in df.iterrows():
+    for portfolio in portfolios:
+        df = portfolio.df
+        portfolio.selected = select_rows_to_reprice(portfolio)
+        portfolio.all_item_names = build_item_names(df['Item'], df['Condition'])
+        portfolio.item_names = portfolio.all_item_names.where(portfolio.selected)
+
+        # % change of an item is taken against the old value of its first row, as when items were priced row by row.
+        # Old values are journaled before fetching, as checkpoints change the current values in the spreadsheet
+        old_values = pd.Series(df['Current Value [Steam]'].values, index=portfolio.item_names.values)
+        old_values = old_values[old_values.index.notna() & ~old_values.index.duplicated()]
+        portfolio.first_old_values = portfolio.item_names.map(
+            journal.old_values(os.path.abspath(portfolio.workbook.path), old_values.to_dict())
+        )
+
+    unique_names = prioritise(portfolios)
+
+    if option == "f":
+        # Current Value is taken from the first source in all_sources order with a price
+        table = fetch_all_sources(unique_names)
+        prices = table.bfill(axis=1).iloc[:, 0]
+    else:
+        table = None
+        checkpoint = partial(save_checkpoint, portfolios=portfolios)
+        prices = to_price_series(fetch_prices(unique_names, option, checkpoint), unique_names)
 
-        item, condition = row['Item'], row['Condition']
-        item_name = f"{item.strip()}" if pd.isnull(condition) else f"{item.strip()} ({condition.strip()})"
+    for portfolio in portfolios:
+        selected = portfolio.selected
+        updated = apply_prices(portfolio, prices)
+        portfolio.df.loc[selected, 'Current Value Updated'] = updated[selected].map({True: "y", False: "n"})
 
-        print(f"[{index}] {item_name}")
+        if table is not None:
+            update_source_columns(portfolio, table, updated)
 
-        # Skin has been processed before so avoid calling API by retrieving info from cache
-        if item_name in items_processed and item_name in percentage_changes:
-            update_dataframe_on_success(index, item_name)
-            continue
+        metrics.count("rows_updated", int(updated.sum()))
+        print(f"{portfolio.label}Updated {int(updated.sum())}/{int(selected.sum())} selected rows "
+              f"({len(portfolio.df)} total)")
 
-        # Skin hasn't been processed yet
-        if option == "a":
-            current_value = get_current_item_value_steam(name=item_name)
-        elif option == "e":
-            current_value = get_current_item_value_cs_float(name=item_name)
-        else:
-            current_value = get_current_item_value_cs_trader(name=item_name)
+    # items priced for the first time are added to the catalog under the name the source knows them by (the feed name of
+    # a resolved name), so they can be grouped by category
+    catalog.learn(catalog_names)
+    catalog_names.clear()
+
+    for portfolio in portfolios:
+        update_categories(portfolio)
+
+    not_found = prices.index[prices.isna()]
+    metrics.count("items_not_found", len(not_found))
+    print(f"{len(prices) - len(not_found)}/{len(prices)} unique items priced")
+
+    for item_name in not_found:
+        print("An error occurred [ITEM NOT FOUND]:", item_name)
+
+
+def apply_prices(portfolio, prices):
+    """
+
+    Writes prices into the rows of a spreadsheet's dataframe whose item name has one: current value, % change against
+    the row's old value, updated flag and time
+
+    portfolio: Portfolio whose item names (NaN for rows not repriced) and old values were set by update_dataframe()
+    prices: Series of item name -> price, NaN for items that could not be priced
+
+    :returns: boolean Series, True for the rows updated
+
+    """
+
+    df = portfolio.df
+    new_values = portfolio.item_names.map(prices)
+    updated = new_values.notna()
+
+    df.loc[updated, 'Current Value % Change'] = percentage_change(portfolio.first_old_values, new_values)[updated]
+    df.loc[updated, 'Current Value [Steam]'] = new_values[updated]
+    df.loc[updated, 'Current Value Updated'] = "y"
+    df.loc[updated, 'Current Value Updated At'] = datetime.now().replace(microsecond=0)
+
+    return updated
+
+
+def save_checkpoint(fetched, portfolios):
+    """
+
+    Writes the prices fetched so far into the spreadsheets and saves them, so they already hold the progress of a long
+    fetch which is then interrupted (the prices themselves are kept in the reprice journal)
+
+    fetched: dictionary of item name -> price (False for items that could not be priced)
+
+    """
+
+    updated = 0
+
+    with metrics.stage("checkpoint"):
+        prices = to_price_series(fetched, list(fetched))
+
+        for portfolio in portfolios:
+            updated += int(apply_prices(portfolio, prices).sum())
+            dataframe_to_excel(portfolio)
+            save_excel(portfolio)
+
+    print(f"Checkpoint saved: {updated} rows updated so far\n")
+
+
+def select_rows_to_reprice(portfolio):
+    """
+
+    Selects the rows of a spreadsheet to reprice for the configured reprice mode
+
+    "all": every row
+    "stale": unsold rows (Sold Price is "N/A") whose last update is older than reprice_window seconds
+
+    :returns: boolean Series, True for rows to reprice
+
+    """
+
+    df = portfolio.df
+    selected = df['Item'].notna()
+
+    if reprice_mode == "stale":
+        last_updated = pd.to_datetime(df['Current Value Updated At'], errors="coerce")
+        fresh = last_updated >= datetime.now() - timedelta(seconds=config.reprice_window)
+        selected &= (df['Sold Price'] == "N/A") & ~fresh
+
+    print(f"{portfolio.label}Repricing {int(selected.sum())}/{len(df)} rows [{reprice_mode}]\n")
+
+    return selected
+
+
+def prioritise(portfolios):
+    """
+
+    Orders the unique item names of the spreadsheets so the most important items are fetched first, if a run is cut
+    short by rate limits the most valuable ("value") or most volatile ("volatility") items are already up to date
+
+    :returns: list of unique item names in fetch order
+
+    """
+
+    item_names = pd.concat([portfolio.item_names for portfolio in portfolios], ignore_index=True)
+    unique_names = item_names.dropna().drop_duplicates()
+
+    if config.reprice_priority == "value":
+        keys = [pd.to_numeric(portfolio.df['Current Value [Steam]'], errors="coerce") for portfolio in portfolios]
+    elif config.reprice_priority == "volatility":
+        keys = [pd.to_numeric(portfolio.df['Current Value % Change'], errors="coerce").abs()
+                for portfolio in portfolios]
+    else:
+        return unique_names.tolist()
+
+    key = pd.concat(keys, ignore_index=True)
+    order = key.groupby(item_names).max().reindex(unique_names).sort_values(ascending=False, na_position="last")
+
+    return order.index.tolist()
+
+
+def fetch_prices(names, source, checkpoint=None):
+    """
+
+    Retrieves prices for all unique item names from a source option (a-e)
+
+    Prices replayed from the journal of the interrupted run being resumed (--resume) are used first, then fresh prices
+    are served from the persistent price cache, only missing or stale items are fetched from the source (nothing is
+    fetched in "cache" mode, everything is fetched in "refresh" mode). Price sources are only downloaded when at least
+    one item has to be fetched. Fetched prices are written to the reprice journal as they arrive.
+
+    checkpoint: optional function called with all prices so far whenever a checkpoint of the workbook is due (option A)
+
+    :returns: dictionary of item name -> price (False for items that could not be priced)
+
+    """
+
+    replayed = journal.replayed_prices(source, names)
+    remaining = [name for name in names if name not in replayed]
+    cached = {} if price_cache_mode == "refresh" else price_cache.get_fresh(remaining, source, currency)
+    missing = [name for name in remaining if name not in cached]
+    prices = replayed | cached
+
+    print(f"[{source_labels[source]}] {len(cached)} prices from cache, "
+          f"{f'{len(replayed)} from the journal, ' if replayed else ''}"
+          f"{0 if price_cache_mode == 'cache' else len(missing)} to fetch\n")
+    metrics.count("cache_hits", len(cached))
+
+    fetched = {}
+
+    if price_cache_mode != "cache" and missing:
+        load_price_source(source)
+
+        with metrics.stage("price_lookup"):
+            if source == "a":
+                # checkpoints also hold the prices replayed and served from the cache
+                steam_checkpoint = None if checkpoint is None else lambda so_far: checkpoint(prices | so_far)
+                fetched = fetch_steam_prices(missing, steam_checkpoint)
+                catalog_names.update(name for name, value in fetched.items() if value is not False)
+            else:
+                found = build_price_table(missing, source)
+                catalog_names.update(found.index)
+
+                if config.name_resolution and len(found) < len(missing):
+                    unmatched = [name for name in missing if name not in found.index]
+                    found = pd.concat([found, resolve_names(unmatched, source)])
+                journal.record(found.to_dict(), source)
+                fetched = {name: False for name in missing} | found.to_dict()
+
+        metrics.count("items_fetched", len(missing))
+
+    # replayed prices were never stored, as the run they were fetched by was interrupted
+    successful = replayed | {name: value for name, value in fetched.items() if value is not False}
+    price_cache.put_many(successful, source, currency)
+    price_history.append(successful, source, currency)
+    prices.update(fetched)
+
+    return prices
+
+
+def load_price_source(source):
+    """
+
+    Retrieves the conversion rate and bulk price feed needed by a source option
+
+    Both are kept in memory and only retrieved again once expired (fx_ttl, feed_snapshot_revalidate), so
+    in daemon mode a cycle only pays for the sources that have changed. Each is retrieved under its own lock, so
+    sources fetched at the same time (option F) never download the same thing twice.
+
+    """
+
+    global conversion_rate, cs_float_table, cs_trader_table
+
+    if source == "a":
+        return
+
+    feed = "cs_float" if source == "e" else "cs_trader"
+
+    with source_locks["conversion_rate"]:
+        if not is_loaded("conversion_rate", config.fx_ttl):
+            with metrics.stage("conversion_rate"):
+                conversion_rate = fx.get_rate(currency)
+            loaded_at["conversion_rate"] = time.monotonic()
+
+    with source_locks[feed]:
+        if is_loaded(feed, config.feed_snapshot_revalidate.get(feed, 0)):
+            return
+
+        with metrics.stage("feed_download"):
+            if source == "e":
+                cs_float_table = load_table("cs_float", config.cs_float_price_list_url)
+            else:
+                cs_trader_table = load_table("cs_trader", config.cs_trader_prices_url)
+        loaded_at[feed] = time.monotonic()
+
+        print(f"{feed} snapshot age: {describe_age(snapshot_freshness().get(feed, 0))}\n")
+
+
+def build_price_table(names, source):
+    """:returns: Series of item name -> converted price from the bulk feed of a source option (b-e), see above"""
+
+    return build_price_table_cs_float(names) if source == "e" else build_price_table_cs_trader(names, source)
 
-        if current_value is False:  # Invalid item due to typo in file or JSON response failure, don't update item and write "n"
-            update_dataframe_failure(index)
-        else:  # Skin is valid: update processed items and percentage change cache, update item's; value percentage change, current value and update item value modified status
-            update_cache(item_name, current_value, index)
-            update_dataframe_on_success(index, item_name)
 
+def resolve_names(names, source):
+    """
+
+    Looks up item names without an exact match in a bulk feed in the feed's name index (see name_index.py), which
+    resolves differences like a missing StatTrak™/★, stray spaces or an abbreviated wear without any request
+
+    Every correction is printed so the spreadsheet can be fixed
+
+    :returns: Series of item name -> price of the resolved names
+
+    """
+
+    feed = "cs_float" if source == "e" else "cs_trader"
+    index = get_name_index(feed)
+    matches = {name: match for name, match in zip(names, map(index.resolve, names)) if match is not None}
+    feed_prices = build_price_table(list({feed_name for feed_name, _ in matches.values()}), source)
+    resolved = {}
+
+    for name, (feed_name, similarity) in matches.items():
+        if feed_name in feed_prices.index:
+            resolved[name] = feed_prices[feed_name]
+            catalog_names.add(feed_name)
+            print(f"Resolved '{name}' -> '{feed_name}' [{similarity:.0%} similar]")
+
+    metrics.count("names_resolved", len(resolved))
+
+    return pd.Series(resolved, dtype=float)
+
+
+def get_name_index(feed):
+    """:returns: name index of a feed's keys, built once each time the feed is loaded"""
+
+    with source_locks[feed]:
+        if feed not in name_indexes or name_indexes[feed][0] != loaded_at[feed]:
+            with metrics.stage("name_index"):
+                keys = cs_float_table.keys() if feed == "cs_float" else cs_trader_table.keys()
+                name_indexes[feed] = loaded_at[feed], NameIndex(keys, config.name_resolution_threshold)
+
+        return name_indexes[feed][1]
+
+
+def fetch_all_sources(names):
+    """
+
+    Retrieves prices for all unique item names from every source in all_sources at the same time (option F)
+
+    Each source runs in its own thread (Steam requests keep their own worker pool and rate limit), so the fetch takes as
+    long as the slowest source rather than the sum of all of them
 
-def update_cache(item_name, current_value, index):
+    :returns: DataFrame of item name -> price per source option, in all_sources order, NaN where a source has no price
+
+    """
+
+    with ThreadPoolExecutor(max_workers=len(config.all_sources)) as executor:
+        futures = {source: executor.submit(fetch_prices, names, source) for source in config.all_sources}
+
+    return pd.DataFrame({source: to_price_series(future.result(), names) for source, future in futures.items()},
+                        index=pd.Index(names, dtype=object))
+
+
+def to_price_series(fetched, names):
     """
 
-    Updates processed skins caches for: item current value and percentage change for item value, minimizes calls to
-    Steam endpoint
+    :returns: Series of item name -> price from a fetch_prices() result, NaN for items that could not be priced or were
+    not fetched at all (items without a cached price in "cache" mode)
 
     """
 
-    items_processed[item_name] = current_value
-    percentage_changes[item_name] = percentage_change(df.at[index, 'Current Value [Steam]'], current_value)
+    prices = [fetched.get(name, False) for name in names]
+    return pd.Series([None if price is False else price for price in prices], index=names, dtype=float)
 
 
-def update_dataframe_on_success(index, item_name):
+def update_source_columns(portfolio, table, updated):
     """
 
-    Updates 'Current Value', 'Current Value % Change', and 'Current Value Updated' columns in data frame
-    if item has been processed before or on successful response from Steam endpoint
+    Writes the comparison of all sources into the source columns of a spreadsheet's updated rows (option F)
+
+    Best Price/Best Source: highest price of any source and its name, the best price the item can be sold for
+    Lowest Price: lowest price of any source
+    Price Spread: difference between the best and lowest price
 
     """
 
-    df.at[index, 'Current Value % Change'] = percentage_changes[item_name]
-    df.at[index, 'Current Value [Steam]'] = items_processed[item_name]
-    df.at[index, 'Current Value Updated'] = "y"
+    best = table.max(axis=1)
+    lowest = table.min(axis=1)
+    best_source = table.fillna(-1).idxmax(axis=1).map(source_labels).where(best.notna())
+
+    comparison = {"Best Price": best, "Best Source": best_source, "Lowest Price": lowest, "Price Spread": best - lowest}
+
+    for column, values in comparison.items():
+        portfolio.df.loc[updated, column] = portfolio.item_names[updated].map(values)
+
 
+def is_loaded(source, ttl):
+    """:returns: True if source is held in memory and was retrieved less than ttl seconds ago"""
+
+    return source in loaded_at and time.monotonic() - loaded_at[source] < ttl
+
+
+def update_history_columns(portfolio, history):
+    """
+
+    Writes windowed metrics from the price history into the extra history columns for every row of a spreadsheet
+
+    24h/7d/30d % change, 30d min/max and 30d volatility (standard deviation of daily changes) of the item's price
+
+    history: window metrics of the price history (price_history.window_metrics), read once for all spreadsheets
+
+    """
 
-def update_dataframe_failure(index):
-    """Updates 'Current Value Updated' column when response from Steam endpoint is unsuccessful"""
+    df = portfolio.df
 
-    df.at[index, 'Current Value Updated'] = "n"
+    for metric, (column, _) in history_columns.items():
+        values = portfolio.all_item_names.map(history[metric])
+        df[column] = values.astype(object).where(values.notna(), None)
 
 
-def dataframe_to_excel():
+def build_item_names(items, conditions):
+    """
+
+    Builds Steam market hash names from spreadsheet columns 'B' and 'C' for all rows at once
+
+    Names of items in the item catalog are spelled as in the catalog, e.g. "ak-47 | redline  (field-tested)" becomes
+    "AK-47 | Redline (Field-Tested)"
+
+    """
+
+    items = items.str.strip()
+    names = items.where(conditions.isnull(), items + " (" + conditions.str.strip() + ")")
+
+    return names.map({name: catalog.market_name(name) for name in names.dropna().unique()})
+
+
+def update_categories(portfolio):
+    """
+
+    Groups the unsold items of a spreadsheet by category (item catalog type e.g. Rifle, Knife, Sticker) and prints the
+    number of items and value held in each, the category of every row is also written into the 'Category' column if
+    item_category_column is set
+
+    """
+
+    df = portfolio.df
+    names = portfolio.all_item_names
+
+    # looked up once per unique name, through the catalog spelling as items priced by this cycle were just added to it
+    categories = names.map({name: catalog.category(catalog.market_name(name)) for name in names.dropna().unique()})
+    categories = categories.fillna("Other")
+
+    if config.item_category_column:
+        df['Category'] = categories
+
+    unsold = df['Sold Price'] == "N/A"
+    values = pd.to_numeric(df['Current Value [Steam]'][unsold], errors="coerce")
+    summary = values.groupby(categories[unsold]).agg(["count", "sum"]).sort_values("sum", ascending=False)
+
+    if not summary.empty:
+        held = [f"{category} {count} ({total:.2f} {currency})" for category, count, total in summary.itertuples()]
+        print(f"{portfolio.label}Held by category: {', '.join(held)}")
+
+
+def dataframe_to_excel(portfolio):
     """Update Excel file with updated values from dataframe"""
 
-    # Write the updated "Current Value," "Current Value % Change," and "Current Value Updated" columns to the Excel file
-    for index, (current_value, current_value_change, current_value_updated) in enumerate(
-            zip(df['Current Value [Steam]'], df['Current Value % Change'], df['Current Value Updated']), start=2):
-        cell_current_value = f'F{index}'  # Assuming the "Current Value [Steam]" column is column F
-        cell_current_value_change = f'G{index}'  # Assuming the "Current Value % Change" column is column G
-        cell_current_value_updated = f'J{index}'  # Assuming the "Current Value Updated" column is column J
+    # Write the updated "Current Value," "Current Value % Change," and "Current Value Updated" columns, changed cells only
+    columns = ['Current Value [Steam]', 'Current Value % Change', 'Current Value Updated', 'Current Value Updated At']
+
+    if config.price_history_columns:
+        columns += [column for column, _ in history_columns.values()]
+
+    if option == "f":
+        columns += list(source_columns)
 
-        ws[cell_current_value] = current_value
-        ws[cell_current_value_change] = current_value_change
-        ws[cell_current_value_updated] = current_value_updated
+    if config.item_category_column:
+        columns.append('Category')
 
-    update_expected_percentage_change()
-    update_time_modified()
+    written = portfolio.workbook.write_columns(portfolio.df, columns)
+    print(f"{portfolio.label}{written} cells changed")
 
+    update_expected_percentage_change(portfolio)
+    update_time_modified(portfolio)
 
-def update_expected_percentage_change():
+
+def update_expected_percentage_change(portfolio):
     """Updates cell M1 with expected profit percentage change"""
 
-    new_expected_profit = calculate_expected_profit()
-    ws['M1'] = percentage_change(old_expected_profit, new_expected_profit)
+    new_expected_profit = calculate_expected_profit(portfolio.df)
+    portfolio.workbook.set_cell('M1', percentage_change(portfolio.old_expected_profit, new_expected_profit))
 
 
-def update_time_modified():
+def update_time_modified(portfolio):
     """ Updates cell L3 with the current date and time"""
 
     current_time = datetime.now().strftime("%d/%m/%Y at %H:%M")
-    ws['L3'] = current_time  # Writing update time into cell L3
+    portfolio.workbook.set_cell('L3', current_time)  # Writing update time into cell L3
 
 
-def save_excel():
+def save_excel(portfolio):
     """Saves the updated Excel file with the original formatting to specified directories"""
 
-    wb.save(file_path_local)
-
-    if file_path_desktop is not None:
-        wb.save(file_path_desktop)
+    with metrics.stage("save_excel[local]"):
+        portfolio.workbook.save(portfolio.path)
 
-
-def get_conversion_rate():
-    """Retrieves USD -> GBP conversion rate"""
-
-    url = "https://www.xe.com/currencyconverter/convert/?Amount=1&From=USD&To=GBP"
-    res = requests.get(url)
-    soup = BeautifulSoup(res.content, 'html.parser')
-
-    return soup.find('span', class_='faded-digits').parent.text[:-14].strip()
+    if portfolio.desktop_path is not None:
+        with metrics.stage("save_excel[desktop]"):
+            portfolio.workbook.save(portfolio.desktop_path)
 
 
 def main_menu():
@@ -339,48 +783,343 @@ def main_menu():
     print("[B] Update current values using CSGO Trader Steam 24hr Avg [Updated every 8 hours][DEPRECATED]")
     print("[C] Update current values using CSGO Trader Steam 7day Avg [Updated every 8 hours][DEPRECATED]")
     print("[D] Update current values using CSGO Trader Skinport Suggested Price [Updated every 8 hours][DEPRECATED]")
-    print("[E] Update current values using CSGO Float Prices\n")
+    print("[E] Update current values using CSGO Float Prices")
+    print("[F] Compare all sources at once [Current Value from the first source with a price, see all_sources]\n")
 
     choice = input("Select an option: ").strip().lower()
     print()
     return choice
 
 
+def parse_args():
+    """Command line options, every option left out falls back to its value in config.py"""
+
+    parser = argparse.ArgumentParser(description="Updates the current values of a CS2 tracking spreadsheet")
+    parser.add_argument("--option", choices=["a", "b", "c", "d", "e", "f"], type=str.lower,
+                        help="price source to use (see the menu), skips the menu so the script can run unattended")
+    parser.add_argument("--file", metavar="PATH", help="spreadsheet to update [file_path_local]")
+    parser.add_argument("--desktop-file", metavar="PATH", help="second path the spreadsheet is saved to "
+                                                               "[file_path_desktop]")
+    parser.add_argument("--batch", metavar="PATH", nargs="+",
+                        help="reprice several spreadsheets in one run, every unique item is priced once for all of "
+                             "them and each spreadsheet is saved in place [batch_file_paths]")
+    parser.add_argument("--currency", help="currency prices are retrieved in e.g. GBP, USD, EUR [currency]")
+    parser.add_argument("--cache-mode", choices=["stale", "cache", "refresh"], help="[price_cache_mode]")
+    parser.add_argument("--reprice-mode", choices=["all", "stale"], help="[reprice_mode]")
+    parser.add_argument("--max-workers", type=int, help="concurrent Steam requests [steam_max_workers]")
+    parser.add_argument("--rate", type=float, help="initial Steam requests per second [steam_initial_rate]")
+    parser.add_argument("--max-retries", type=int, help="retries of a rate limited or failed Steam item "
+                                                        "[steam_max_retries]")
+    parser.add_argument("--history-columns", action="store_true", default=None,
+                        help="write the price history columns [price_history_columns]")
+    parser.add_argument("--category-column", action="store_true", default=None,
+                        help="write the category of every item into a 'Category' column [item_category_column]")
+    parser.add_argument("--daemon", metavar="SECONDS", type=float,
+                        help="keep running and reprice every SECONDS, the workbook, conversion rate and feeds stay in "
+                             "memory between cycles")
+    parser.add_argument("--cycles", type=int, help="stop the daemon after this many cycles")
+    parser.add_argument("--resume", action="store_true",
+                        help="resume an interrupted run: replay the prices in its journal and only fetch the rest")
+    parser.add_argument("--checkpoint-interval", metavar="SECONDS", type=float,
+                        help="save the workbook with the prices so far every SECONDS while Steam prices are fetched, "
+                             "0 for never [journal_checkpoint_interval]")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write stage timings, request and cache statistics to a JSON (or .csv) report")
+    parser.add_argument("--cprofile", metavar="PATH", help="write a cProfile capture of the dataframe update")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="DIR", help="also save every response to a cassette directory "
+                                                          "[http_mode, http_cassette_dir]")
+    cassette.add_argument("--replay", metavar="DIR", help="serve the responses recorded in a cassette directory, "
+                                                          "without any network")
+
+    args = parser.parse_args()
+
+    overrides = {
+        "file_path_local": args.file,
+        "file_path_desktop": args.desktop_file,
+        "batch_file_paths": args.batch,
+        "currency": args.currency,
+        "price_cache_mode": args.cache_mode,
+        "reprice_mode": args.reprice_mode,
+        "steam_max_workers": args.max_workers,
+        "steam_initial_rate": args.rate,
+        "steam_max_retries": args.max_retries,
+        "price_history_columns": args.history_columns,
+        "item_category_column": args.category_column,
+        "journal_checkpoint_interval": args.checkpoint_interval,
+        "http_mode": "record" if args.record else "replay" if args.replay else None,
+        "http_cassette_dir": args.record or args.replay,
+    }
+
+    for key, value in overrides.items():
+        if value is not None:
+            setattr(config, key, value)
+
+    return args
+
+
+class Portfolio:
+    """
+
+    A spreadsheet repriced by the run, parsed once and kept in memory between cycles
+
+    path: spreadsheet file
+    desktop_path: second path the spreadsheet is saved to, None for none
+    label: prefix of the messages about this spreadsheet, empty unless several spreadsheets are repriced (--batch)
+
+    workbook: PortfolioWorkbook (or PortfolioStore) and df its dataframe, set by load_workbook()
+    modified_at: modification time of the file when it was last loaded or saved
+    old_expected_profit: expected profit before the cycle, cell M1 holds the % change against it
+    all_item_names: item name of every row, built once per cycle by update_dataframe()
+    selected, item_names, first_old_values: rows repriced by the cycle, their item names and the values their % change
+        is taken against, set by update_dataframe()
+
+    """
+
+    def __init__(self, path, desktop_path=None, label=""):
+        self.path = path
+        self.desktop_path = desktop_path
+        self.label = label
+        self.workbook = None
+        self.df = None
+        self.modified_at = None
+        self.old_expected_profit = 0.0
+
+
+def load_workbook(portfolio):
+    """
+
+    Loads the spreadsheet (or the portfolio store if portfolio_store_path is set) into workbook and Pandas dataframe
+    with a single parse and adds any missing columns
+
+    """
+
+    with metrics.stage("load_workbook"):
+        workbook = open_portfolio(portfolio.path)
+
+    workbook.ensure_column('Current Value Updated At', style_column='Current Value Updated')
+
+    if config.price_history_columns:
+        for column, number_format in history_columns.values():
+            workbook.ensure_column(column, style_column='Current Value % Change', number_format=number_format)
+
+    if option == "f":
+        for column, number_format in source_columns.items():
+            workbook.ensure_column(column, style_column='Current Value [Steam]', number_format=number_format)
+
+    if config.item_category_column:
+        workbook.ensure_column('Category', style_column='Item')
+
+    portfolio.workbook, portfolio.df = workbook, workbook.df
+    portfolio.modified_at = os.path.getmtime(workbook.path)
+
+
+def write_portfolio(portfolio, history=None):
+    """Writes a repriced spreadsheet's changed cells (and history columns if history is given) and saves it"""
+
+    if history is not None:
+        with metrics.stage("price_history"):
+            update_history_columns(portfolio, history)
+
+    with metrics.stage("dataframe_to_excel"):
+        dataframe_to_excel(portfolio)
+
+    save_excel(portfolio)
+    portfolio.modified_at = os.path.getmtime(portfolio.workbook.path)
+
+
+def run_cycle():
+    """
+
+    One repricing pass over the spreadsheets in memory: update the dataframes, write the changed cells and save
+
+    A spreadsheet is only parsed again if it was changed by something else since it was last saved. The prices fetched
+    are journaled until the spreadsheets are saved, the first cycle resumes an interrupted run with --resume. The
+    spreadsheets are written and saved in parallel (batch_max_workers at a time).
+
+    """
+
+    global resume
+
+    for portfolio in portfolios:
+        if os.path.getmtime(portfolio.workbook.path) != portfolio.modified_at:
+            print(f"{portfolio.label}Spreadsheet changed on disk, reloading\n")
+            load_workbook(portfolio)
+
+    run = {"files": [os.path.abspath(portfolio.workbook.path) for portfolio in portfolios], "option": option,
+           "currency": currency}
+    replayed = journal.start(run, resume)
+    resume = False
+
+    if replayed:
+        print(f"Resuming an interrupted run, {replayed} prices replayed from {config.journal_path}\n")
+
+    # Previous expected profit to be used in % change calculation later
+    for portfolio in portfolios:
+        portfolio.old_expected_profit = journal.old_expected_profit(os.path.abspath(portfolio.workbook.path),
+                                                                    calculate_expected_profit(portfolio.df))
+
+    with metrics.stage("update_dataframe"):
+        if profiler is not None:
+            profiler.runcall(update_dataframe, portfolios)
+            profiler.dump_stats(args.cprofile)
+        else:
+            update_dataframe(portfolios)
+
+    history = None
+
+    if config.price_history_columns:
+        with metrics.stage("price_history"):
+            history = price_history.window_metrics(sources[0], currency)
+
+    with ThreadPoolExecutor(max_workers=min(len(portfolios), config.batch_max_workers)) as executor:
+        # list() re-raises the first error of any spreadsheet
+        list(executor.map(partial(write_portfolio, history=history), portfolios))
+
+    journal.finish()
+
+    price_cache.evict()
+    catalog.save()
+
+    for source in sources:
+        price_history.compact(source, currency)
+
+
+def run_daemon(interval, cycles=None):
+    """
+
+    Reprices every interval seconds until interrupted (or cycles have run)
+
+    Prices still fresh in the price cache, the conversion rate and the feeds are reused, so a cycle only costs the
+    prices that have expired and the cells that changed
+
+    A cycle that fails (e.g. the spreadsheet is open in Excel, a price source cannot be reached) does not stop the
+    daemon: the error is printed, the journal is kept and replayed by the next cycle, one interval later
+
+    """
+
+    global resume
+
+    cycle = 0
+
+    while True:
+        start = time.monotonic()
+        cycle += 1
+
+        try:
+            run_cycle()
+            status = "finished"
+        except Exception as e:
+            print(f"\nCycle {cycle} failed: {type(e).__name__}: {e}")
+            status = "failed"
+
+            # prices fetched by the failed cycle are not fetched again
+            if journal.file is not None:
+                journal.close()
+                resume = True
+
+        elapsed = time.monotonic() - start
+        print(f"Cycle {cycle} {status} in {elapsed:.1f}s at {datetime.now().strftime('%H:%M:%S')}\n")
+
+        if cycles is not None and cycle >= cycles:
+            return
+
+        time.sleep(max(0.0, interval - elapsed))
+
+
 if __name__ == "__main__":
 
-    option = main_menu()
-    valid_options = {"a", "b", "c", "d", "e"}
+    args = parse_args()
+    option = args.option or main_menu()
+    valid_options = {"a", "b", "c", "d", "e", "f"}
 
     if option not in valid_options:
         print("invalid option")
         quit(0)
 
-    rate_limited = None
+    # prices are retrieved in / converted to this currency, the persistent price cache keeps each currency separately
+    currency = config.currency.upper()
 
-    if option == "a":
-        rate_limited = False
-    elif option == "e":
-        conversion_rate = get_conversion_rate().strip()
-        data = requests.get("https://csfloat.com/api/v1/listings/price-list").json()
-        cs_float_json = {item["market_hash_name"]: item for item in data}
-    else:
-        conversion_rate = get_conversion_rate().strip()
-        cs_trader_json = requests.get("https://prices.csgotrader.app/latest/prices_v6.json").json()
+    if currency not in fx.STEAM_CURRENCY_CODES:
+        print(f"invalid currency {currency}, Steam supports: {', '.join(fx.STEAM_CURRENCY_CODES)}")
+        quit(0)
 
-    # Load Excel spreadsheet into workbook and Pandas dataframe
-    file_path_local = config.file_path_local
-    file_path_desktop = config.file_path_desktop
+    price_cache_mode = config.price_cache_mode
+    price_cache = PriceCache(config.price_cache_path, config.price_cache_ttl, config.price_cache_max_age,
+                             config.price_cache_max_entries)
 
-    df = pd.read_excel(file_path_local)
-    wb = load_workbook(file_path_local)
-    ws = wb.active
+    # metadata of every item seen (shared with inventory.py), items priced for the first time are added to it
+    catalog = ItemCatalog(config.item_catalog_path)
 
-    # Processing caches
-    items_processed, percentage_changes = {}, {}
+    # names of the items fetched by the running cycle as the price source knows them, added to the catalog
+    catalog_names = set()
 
-    # Previous expected profit to be used in % change calculation later
-    old_expected_profit = calculate_expected_profit()
+    # prices fetched by the running cycle, kept on disk until it is saved so an interrupted run can be resumed
+    journal = PriceJournal(config.journal_path, config.journal_checkpoint_interval)
+    resume = args.resume
+
+    # source options priced in this run, option F prices every source in all_sources at once
+    sources = config.all_sources if option == "f" else [option]
+    source_labels = {"a": "Steam", "b": "Steam 24h Avg", "c": "Steam 7d Avg", "d": "Skinport", "e": "CSFloat"}
+
+    # conversion rate and feeds held in memory: source -> time it was retrieved
+    loaded_at = {}
+    source_locks = {source: threading.Lock() for source in ("conversion_rate", "cs_float", "cs_trader")}
+
+    # feed -> (time the feed was retrieved, name index of its keys)
+    name_indexes = {}
+
+    reprice_mode = config.reprice_mode
+
+    # spreadsheets repriced by the run, in batch mode each one is saved in place
+    if config.batch_file_paths:
+        if config.portfolio_store_path is not None:
+            print("batch mode reprices spreadsheets, it cannot be used with a portfolio store (portfolio_store_path)")
+            quit(0)
 
-    update_dataframe()
-    dataframe_to_excel()
-    save_excel()
+        portfolios = [Portfolio(path, label=f"[{os.path.basename(path)}] ") for path in config.batch_file_paths]
+    else:
+        portfolios = [Portfolio(config.file_path_local, config.file_path_desktop)]
+
+    # optional columns of windowed metrics from the price history: metric -> (column header, number format)
+    history_columns = {
+        "change_1d": ("24h % Change", "0.00%"),
+        "change_7d": ("7d % Change", "0.00%"),
+        "change_30d": ("30d % Change", "0.00%"),
+        "min_30d": ("30d Min", fx.price_format(currency)),
+        "max_30d": ("30d Max", fx.price_format(currency)),
+        "volatility_30d": ("30d Volatility", "0.00%"),
+    }
+
+    # option F comparison columns: column header -> number format
+    source_columns = {"Best Price": fx.price_format(currency), "Best Source": None,
+                      "Lowest Price": fx.price_format(currency), "Price Spread": fx.price_format(currency)}
+
+    for portfolio in portfolios:
+        load_workbook(portfolio)
+
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+    else:
+        profiler = None
+
+    try:
+        if args.daemon is not None:
+            run_daemon(args.daemon, args.cycles)
+        else:
+            run_cycle()
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        price_cache.close()
+        catalog.close()
+
+        # the journal of a cycle which did not finish is kept for --resume
+        if journal.file is not None:
+            journal.close()
+            print(f"Prices fetched so far are kept in {config.journal_path}, run again with --resume to continue")
+
+    if args.profile:
+        metrics.print_summary()
+        metrics.write_report(args.profile)
@@ -0,0 +1,141 @@
+import os
+import gzip
+import json
+import time
+import config
+import http_transport
+
+
+def snapshot_paths(name):
+    """:returns: paths of the compressed snapshot and its metadata file for a feed"""
+
+    directory = config.feed_snapshot_dir
+    return os.path.join(directory, f"{name}.json.gz"), os.path.join(directory, f"{name}.meta.json")
+
+
+def read_metadata(name):
+    """:returns: stored snapshot metadata for a feed, empty if the feed has never been downloaded"""
+
+    snapshot_path, meta_path = snapshot_paths(name)
+
+    if not (os.path.exists(snapshot_path) and os.path.exists(meta_path)):
+        return {}
+
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def write_atomic(path, data, mode="wb"):
+    """Writes to a temporary file first so a killed run never leaves a half written snapshot"""
+
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, mode) as f:
+        f.write(data)
+
+    os.replace(tmp_path, path)
+
+
+def sync_feed(name, url):
+    """
+
+    Makes sure the stored snapshot of a bulk price feed is up to date
+
+    A snapshot checked less than feed_snapshot_revalidate[name] seconds ago is used without any request. Otherwise the
+    feed is revalidated with If-None-Match/If-Modified-Since, on 304 the stored snapshot is kept, on 200 the new
+    body is stored gzip compressed along with its ETag and Last-Modified headers. If the feed cannot be retrieved
+    (connection error, timeout, error status) the stored snapshot is used, and revalidated again by the next run.
+
+    :returns: snapshot metadata and the downloaded body, the body is None when the stored snapshot is still current
+
+    """
+
+    import requests
+
+    os.makedirs(config.feed_snapshot_dir, exist_ok=True)
+    snapshot_path, meta_path = snapshot_paths(name)
+    metadata = read_metadata(name)
+    now = time.time()
+
+    if metadata and now - metadata["checked_at"] < config.feed_snapshot_revalidate.get(name, 0):
+        print(f"Using {name} snapshot, {describe_age(now - metadata['fetched_at'])} old [not revalidated]")
+        return metadata, None
+
+    headers = {}
+
+    if metadata.get("etag"):
+        headers["If-None-Match"] = metadata["etag"]
+    if metadata.get("last_modified"):
+        headers["If-Modified-Since"] = metadata["last_modified"]
+
+    try:
+        response = http_transport.get(url, headers=headers)
+
+        if response.status_code == 304 and metadata:
+            metadata["checked_at"] = now
+            write_atomic(meta_path, json.dumps(metadata), mode="w")
+            print(f"Using {name} snapshot, {describe_age(now - metadata['fetched_at'])} old [not modified]")
+            return metadata, None
+
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if not metadata:
+            raise
+
+        age = describe_age(now - metadata["fetched_at"])
+        print(f"Could not retrieve the {name} feed ({e}), using the stored snapshot, {age} old")
+        return metadata, None
+
+    metadata = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": now,
+        "checked_at": now,
+        "size": len(response.content),
+    }
+
+    write_atomic(snapshot_path, gzip.compress(response.content, compresslevel=6))
+    write_atomic(meta_path, json.dumps(metadata), mode="w")
+    print(f"Downloaded new {name} snapshot [{len(response.content) / 1e6:.1f} MB]")
+
+    return metadata, response.content
+
+
+def read_snapshot(name):
+    """:returns: parsed JSON of the stored snapshot of a feed"""
+
+    snapshot_path, _ = snapshot_paths(name)
+
+    with open(snapshot_path, "rb") as f:
+        return json.loads(gzip.decompress(f.read()))
+
+
+def snapshot_freshness():
+    """:returns: dictionary of feed name -> seconds since its stored snapshot was downloaded"""
+
+    if not os.path.isdir(config.feed_snapshot_dir):
+        return {}
+
+    now = time.time()
+    freshness = {}
+
+    for file in os.listdir(config.feed_snapshot_dir):
+        if file.endswith(".meta.json"):
+            name = file[:-len(".meta.json")]
+            metadata = read_metadata(name)
+
+            if metadata:
+                freshness[name] = now - metadata["fetched_at"]
+
+    return freshness
+
+
+def describe_age(seconds):
+    """Formats an age in seconds e.g. "2h 13m" """
+
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
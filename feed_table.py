@@ -0,0 +1,167 @@
+import os
+import json
+import glob
+import numpy as np
+import config
+from feed_store import sync_feed, read_snapshot, write_atomic
+
+# numeric fields kept from each feed: field -> dtype, nested fields of the CSGO Trader feed are joined with "."
+FEED_FIELDS = {
+    "cs_float": {"min_price": np.float64, "qty": np.float32},
+    "cs_trader": {
+        "steam.last_24h": np.float64,
+        "steam.last_7d": np.float64,
+        "steam.last_30d": np.float64,
+        "steam.last_90d": np.float64,
+        "skinport.suggested_price": np.float64,
+        "skinport.starting_at": np.float64,
+        "buff163.starting_at.price": np.float64,
+        "buff163.highest_order.price": np.float64,
+    },
+}
+
+
+class FeedTable:
+    """
+
+    Compact price table of a bulk price feed
+
+    names: sorted array of UTF-8 encoded item names
+    fields: dictionary of field -> numeric array aligned with names, NaN where the feed has no value
+
+    The arrays are memory-mapped from .npy files, so loading a table reads nothing up front and a lookup only touches
+    the pages of the rows it needs
+
+    """
+
+    def __init__(self, names, fields):
+        self.names = names
+        self.fields = fields
+
+    def lookup(self, names, field):
+        """:returns: array of the field's values for names (binary search on the sorted names), NaN if not found"""
+
+        keys = np.array([name.encode() for name in names], dtype=bytes)
+        positions = np.searchsorted(self.names, keys).clip(max=max(len(self.names) - 1, 0))
+
+        values = np.full(len(keys), np.nan)
+
+        if len(self.names):
+            found = self.names[positions] == keys
+            values[found] = self.fields[field][positions[found]]
+
+        return values
+
+    def keys(self):
+        """:returns: list of all item names of the feed"""
+
+        return [name.decode() for name in self.names]
+
+
+def table_paths(name, version):
+    directory = os.path.join(config.feed_snapshot_dir, "tables")
+    return directory, os.path.join(directory, f"{name}.json"), os.path.join(directory, f"{name}-{version}-{{}}.npy")
+
+
+def field_value(item, field):
+    """:returns: a (nested) field of a feed item as a float, NaN if it is missing or not a number"""
+
+    for key in field.split("."):
+        if not isinstance(item, dict):
+            return np.nan
+        item = item.get(key)
+
+    try:
+        return float(item)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def build_table(name, data, metadata):
+    """
+
+    Converts parsed feed JSON into a price table and stores it next to the feed snapshot
+
+    CSFloat: list of {"market_hash_name", "qty", "min_price"}, CSGO Trader: dictionary of item name -> nested prices
+
+    Arrays are written to files versioned by the snapshot's download time and the table metadata is written last, so
+    a table that was only partly written is never used, and arrays still mapped by a running process are not replaced
+
+    """
+
+    items = {item["market_hash_name"]: item for item in data} if isinstance(data, list) else data
+    names = sorted(items, key=lambda item_name: item_name.encode())
+    fields = {field: np.array([field_value(items[item_name], field) for item_name in names], dtype=dtype)
+              for field, dtype in FEED_FIELDS[name].items()}
+    encoded = np.array([item_name.encode() for item_name in names], dtype=bytes)
+
+    version = int(metadata["fetched_at"] * 1000)
+    directory, meta_path, array_path = table_paths(name, version)
+    os.makedirs(directory, exist_ok=True)
+
+    np.save(array_path.format("names"), encoded)
+    for field, values in fields.items():
+        np.save(array_path.format(field), values)
+
+    write_atomic(meta_path, json.dumps({"version": version, "fetched_at": metadata["fetched_at"],
+                                        "fields": list(fields), "rows": len(names)}), mode="w")
+
+    # remove arrays of older versions, ignoring files still mapped (and so locked on Windows)
+    for path in glob.glob(os.path.join(directory, f"{name}-*.npy")):
+        if not os.path.basename(path).startswith(f"{name}-{version}-"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    return FeedTable(encoded, fields)
+
+
+def open_table(name, metadata):
+    """:returns: memory-mapped price table of a feed if one was built from the current snapshot, otherwise None"""
+
+    _, meta_path, _ = table_paths(name, None)
+
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path) as f:
+        table_metadata = json.load(f)
+
+    if table_metadata["fetched_at"] != metadata["fetched_at"] or table_metadata["fields"] != list(FEED_FIELDS[name]):
+        return None
+
+    _, _, array_path = table_paths(name, table_metadata["version"])
+
+    try:
+        names = np.load(array_path.format("names"), mmap_mode="r")
+        fields = {field: np.load(array_path.format(field), mmap_mode="r") for field in table_metadata["fields"]}
+    except (OSError, ValueError):
+        return None
+
+    return FeedTable(names, fields)
+
+
+def load_table(name, url):
+    """
+
+    Retrieves the price table of a bulk price feed
+
+    The feed snapshot is brought up to date first (see feed_store.sync_feed). The feed JSON is only parsed when the
+    feed has changed or no table has been built from the current snapshot yet, every other load memory-maps the table.
+
+    :returns: FeedTable
+
+    """
+
+    metadata, body = sync_feed(name, url)
+
+    if body is None:
+        table = open_table(name, metadata)
+
+        if table is not None:
+            return table
+
+    data = json.loads(body) if body is not None else read_snapshot(name)
+
+    return build_table(name, data, metadata)
@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import time
+import config
+import http_transport
+from feed_store import write_atomic, describe_age
+
+# Steam ECurrencyCode of each currency the market can price in, used as the priceoverview currency parameter
+STEAM_CURRENCY_CODES = {
+    "USD": 1, "GBP": 2, "EUR": 3, "CHF": 4, "RUB": 5, "PLN": 6, "BRL": 7, "JPY": 8, "NOK": 9, "IDR": 10, "MYR": 11,
+    "PHP": 12, "SGD": 13, "THB": 14, "VND": 15, "KRW": 16, "TRY": 17, "UAH": 18, "MXN": 19, "CAD": 20, "AUD": 21,
+    "NZD": 22, "CNY": 23, "INR": 24, "CLP": 25, "PEN": 26, "COP": 27, "ZAR": 28, "HKD": 29, "TWD": 30, "SAR": 31,
+    "AED": 32, "ARS": 34, "ILS": 35, "KZT": 37, "KWD": 38, "QAR": 39, "CRC": 40, "UYU": 41,
+}
+
+CURRENCY_SYMBOLS = {"USD": "$", "GBP": "£", "EUR": "€", "JPY": "¥", "CNY": "¥", "KRW": "₩", "INR": "₹", "RUB": "₽",
+                    "TRY": "₺", "BRL": "R$", "PLN": "zł", "CHF": "CHF", "UAH": "₴"}
+
+
+def steam_currency_code(currency):
+    """:returns: Steam currency code of a currency e.g. "GBP" -> 2, raises ValueError if Steam does not support it"""
+
+    if currency not in STEAM_CURRENCY_CODES:
+        raise ValueError(f"Steam does not price items in {currency}")
+
+    return STEAM_CURRENCY_CODES[currency]
+
+
+def price_format(currency):
+    """:returns: Excel number format of a price in currency e.g. '"£"#,##0.00'"""
+
+    return f'"{CURRENCY_SYMBOLS.get(currency, currency + " ")}"#,##0.00'
+
+
+def read_cached_rates():
+    """:returns: rates stored on disk ({"base", "rates", "fetched_at"}), empty if there are none"""
+
+    if not os.path.exists(config.fx_cache_path):
+        return {}
+
+    with open(config.fx_cache_path) as f:
+        return json.load(f)
+
+
+def get_rates():
+    """
+
+    Retrieves the exchange rates of every currency against USD
+
+    All rates come from a single JSON request and are stored on disk, they are reused without a request until they
+    are fx_ttl seconds old. If the request fails, rates stored earlier are used regardless of their age.
+
+    rates endpoint format:
+    {
+        "result": "success",
+        "base_code": "USD",
+        "rates": {"USD": 1, "GBP": 0.781, "EUR": 0.921, ...}
+    }
+
+    :returns: dictionary of currency -> units of the currency per 1 USD
+
+    """
+
+    import requests
+
+    cached = read_cached_rates()
+
+    if cached and time.time() - cached["fetched_at"] < config.fx_ttl:
+        return cached["rates"]
+
+    try:
+        response = http_transport.get(config.fx_rates_url, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        rates = data["rates"]
+    except (requests.RequestException, ValueError, KeyError) as e:
+        if not cached:
+            raise
+
+        age = describe_age(time.time() - cached["fetched_at"])
+        print(f"Could not retrieve exchange rates ({e}), using rates from {age} ago")
+        return cached["rates"]
+
+    write_atomic(config.fx_cache_path, json.dumps({"base": data.get("base_code", "USD"), "rates": rates,
+                                                   "fetched_at": time.time()}), mode="w")
+
+    return rates
+
+
+def get_rate(currency, base="USD"):
+    """:returns: units of currency per 1 unit of base as a float e.g. get_rate("GBP") -> 0.78"""
+
+    rates = get_rates()
+
+    if currency not in rates or base not in rates:
+        raise ValueError(f"No exchange rate for {base} -> {currency}")
+
+    return rates[currency] / rates[base]
+
+
+def parse_steam_price(price):
+    """
+
+    Converts a Steam price string in any currency to a float
+
+    e.g. "£1,204.22" -> 1204.22, "1.204,22€" -> 1204.22, "5,--€" -> 5.0, "¥ 1,234" -> 1234.0, "R$ 5,00" -> 5.0
+
+    """
+
+    digits = re.sub(r"[^\d.,]", "", price.replace("--", "00")).strip(".,")
+    separator = max(digits.rfind("."), digits.rfind(","))
+
+    # the last separator is the decimal point only if followed by 1 or 2 digits, otherwise it groups thousands
+    if separator != -1 and len(digits) - separator - 1 in (1, 2):
+        whole, fraction = digits[:separator], digits[separator + 1:]
+        return float(re.sub(r"[.,]", "", whole) + "." + fraction)
+
+    return float(re.sub(r"[.,]", "", digits))
@@ -0,0 +1,203 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from datetime import timedelta
+from urllib.parse import urlparse
+import config
+import metrics
+
+# response headers which describe the transfer rather than the body, bodies are recorded decompressed
+TRANSFER_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+lock = threading.Lock()
+session = None
+host_slots = {}
+cassette = None
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when a request has no recorded response"""
+
+    def __init__(self, url):
+        super().__init__(f"No recorded response for {url} in {config.http_cassette_dir}")
+        self.url = url
+
+
+def get_session():
+    """
+
+    :returns: requests Session shared by every thread, created on first use
+
+    Its connection pool keeps up to http_max_per_host connections to each host alive, so consecutive requests to the
+    same host (e.g. every Steam price) reuse a connection instead of opening a new one with a new TLS handshake
+
+    """
+
+    global session
+
+    with lock:
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+
+            pool_size = max([config.http_max_per_host, *config.http_host_limits.values()])
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+        return session
+
+
+def host_slot(url):
+    """:returns: semaphore limiting the concurrent requests to the host of a URL (http_host_limits)"""
+
+    host = urlparse(url).netloc
+
+    with lock:
+        if host not in host_slots:
+            host_slots[host] = threading.BoundedSemaphore(config.http_host_limits.get(host, config.http_max_per_host))
+
+        return host_slots[host]
+
+
+def get(url, params=None, headers=None, timeout=None):
+    """
+
+    Sends a GET request through the shared transport, every call of the scripts goes through here
+
+    live: pooled keep-alive connections, gzip compression, timeouts and per-host concurrency limits
+    record: as live, every response is also saved to the cassette in http_cassette_dir
+    replay: responses are served from the cassette without any network, CassetteMissError if one was never recorded
+
+    Every response is recorded in the run metrics (metrics.request_hooks).
+
+    timeout: seconds, or (connect, read) seconds [http_timeout]
+
+    :returns: requests Response
+
+    """
+
+    import requests
+
+    full_url = requests.Request("GET", url, params=params).prepare().url
+
+    if config.http_mode == "replay":
+        return get_cassette().play(full_url)
+
+    with host_slot(url):
+        response = get_session().get(url, params=params, headers=headers, hooks=metrics.request_hooks,
+                                     timeout=timeout if timeout is not None else config.http_timeout)
+
+    if config.http_mode == "record":
+        get_cassette().record(full_url, response)
+
+    return response
+
+
+def get_cassette():
+    """:returns: Cassette of http_cassette_dir, opened on first use"""
+
+    global cassette
+
+    with lock:
+        if cassette is None or cassette.directory != config.http_cassette_dir:
+            cassette = Cassette(config.http_cassette_dir)
+
+        return cassette
+
+
+class Cassette:
+    """
+
+    Directory of recorded responses, replayed to run the whole pipeline offline with the same responses every time
+
+    Every URL has an entry in index.json (url -> list of recorded responses) and one gzip compressed body file per
+    response. A URL requested several times (e.g. an item retried after error 429) keeps every response, replay serves
+    them in the order they were recorded and repeats the last one.
+
+    index format:
+    {
+        "https://steamcommunity.com/market/priceoverview/?currency=2&appid=730&market_hash_name=...": [
+            {"status": 200, "headers": {"Content-Type": "application/json"}, "body": "3f2a...-0.gz", "elapsed": 0.21}
+        ]
+    }
+
+    directory: cassette directory, created when the first response is recorded
+
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.played = {}
+
+        index_path = os.path.join(directory, "index.json")
+
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+    def record(self, url, response):
+        """Saves a response to the cassette, the index is rewritten after every response so a killed run keeps it"""
+
+        with self.lock:
+            entries = self.index.setdefault(url, [])
+            body = f"{hashlib.sha1(url.encode()).hexdigest()}-{len(entries)}.gz"
+
+            os.makedirs(self.directory, exist_ok=True)
+
+            with open(os.path.join(self.directory, body), "wb") as f:
+                f.write(gzip.compress(response.content, compresslevel=6))
+
+            entries.append({
+                "status": response.status_code,
+                "headers": {key: value for key, value in response.headers.items()
+                            if key.lower() not in TRANSFER_HEADERS},
+                "body": body,
+                "elapsed": response.elapsed.total_seconds(),
+            })
+
+            tmp_path = os.path.join(self.directory, "index.json.tmp")
+
+            with open(tmp_path, "w") as f:
+                json.dump(self.index, f, indent=1)
+
+            os.replace(tmp_path, os.path.join(self.directory, "index.json"))
+
+    def play(self, url):
+        """:returns: next recorded response of a URL as a requests Response, raises CassetteMissError if there is none"""
+
+        import requests
+        from requests.hooks import dispatch_hook
+        from requests.structures import CaseInsensitiveDict
+
+        with self.lock:
+            entries = self.index.get(url)
+
+            if not entries:
+                raise CassetteMissError(url)
+
+            position = self.played.get(url, 0)
+            self.played[url] = position + 1
+            entry = entries[min(position, len(entries) - 1)]
+
+        with open(os.path.join(self.directory, entry["body"]), "rb") as f:
+            content = gzip.decompress(f.read())
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = content
+        response.url = url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.elapsed = timedelta(seconds=entry["elapsed"])
+        response.request = requests.Request("GET", url).prepare()
+
+        return dispatch_hook("response", metrics.request_hooks, response)
@@ -1,24 +1,48 @@
+import os
 import re
 import time
 import config
-from copy import copy
+import argparse
+import threading
+import pandas as pd
 from datetime import datetime
-from selenium import webdriver
-from openpyxl.styles import Font
-import chromedriver_autoinstaller
-from openpyxl import load_workbook
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from collections import defaultdict, deque
+from workbook import RowWriter, name_font
+from portfolio_store import open_portfolio
+from item_catalog import ItemCatalog, RARITY_COLOURS
+from rate_limiter import TokenBucket
+from concurrent.futures import ThreadPoolExecutor
+from steam_inventory import (resolve_steam_id, fetch_inventory, parse_inventory_snapshot, InventoryUnavailableError,
+                             INVENTORY_SNAPSHOT_SCRIPT)
 
-chromedriver_autoinstaller.install()
+# Selenium and chromedriver_autoinstaller are only imported, and chromedriver only checked/installed (a network request),
+# when a browser scrape is about to start, the inventory JSON endpoint needs neither
+chromedriver_installed = False
+chromedriver_lock = threading.Lock()
+
+
+def install_chromedriver():
+    """Installs chromedriver matching the installed Chrome, once per run"""
+
+    global chromedriver_installed
+
+    with chromedriver_lock:
+        if not chromedriver_installed:
+            import chromedriver_autoinstaller
+            chromedriver_autoinstaller.install()
+            chromedriver_installed = True
 
 
 def generate_driver():
     """Generating chromedriver instance"""
 
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+
+    if config.chrome_driver_executable_path is None:
+        install_chromedriver()
+
     chromeOption = Options()
     chromeOption.add_argument("--headless")
     chromeOption.add_argument("--window-size=1600,1200")
@@ -39,172 +63,291 @@ def generate_driver():
     return driver
 
 
-def scrape_inventory():
-    """Scrapes only marketable items from a specified Steam inventory
+def scrape_inventory(inventory_url):
+    """Scrapes only marketable items from a specified Steam inventory with Chrome
+
+    Each inventory page is read from a single snapshot (HTML and item descriptions of the pages built since the last
+    snapshot, see steam_inventory.INVENTORY_SNAPSHOT_SCRIPT) parsed in-process, so items need no WebDriver calls of
+    their own. A snapshot with item slots still loading is taken again (up to 10 times, half a second apart) before the
+    next page is opened, slots which never load are counted and reported.
+
+    inventory_url: Steam inventory URL ending with #730 for CS2
+    first_page: first page of the next snapshot, the last page snapshotted is read again in case it was still loading
+    seen: asset ids of the items already parsed
 
-    flag: determines whether to stop scraping based on an empty inventory slot or disabled forward pagination button
-    processed_count: keeps track of how many items have been processed so seen items are not reprocessed
-    max_row: alternate max_row (starts from row 1) as opposed to ws.max_row (starts at 3 due to 'Last Price Check' cell),
-    allows population from row 1 without leaving two space gap in the spreadsheet
+    :returns: list of marketable item dictionaries (see build_item)
 
     """
 
-    flag, processed_count, max_row = True, 0, 1
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    start = time.perf_counter()
+    items, seen, first_page = [], set(), 0
+    retries, skipped = 0, 0
 
     # generate chromedriver and accept cookies
     driver = generate_driver()
-    driver.get(base_url)
+    driver.get(inventory_url)
     WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, 'acceptAllButton'))).click()
 
     print("Scraping Items...\n")
 
-    while flag:
+    while True:
+        snapshot = driver.execute_script(INVENTORY_SNAPSHOT_SCRIPT, first_page)
+        page_items, last_page, unread = parse_inventory_snapshot(snapshot["html"], snapshot["descriptions"], seen,
+                                                                 catalog)
 
-        # find item holder elements
-        items = driver.find_elements(By.CLASS_NAME, 'itemHolder')
+        # the items are only taken from a snapshot without slots still loading, so they stay in inventory order
+        if unread and retries < 10:
+            retries += 1
+            time.sleep(.5)
+            continue
 
-        if len(items) == 0:
-            print("The inventory is private or unavailable.")
-            quit(0)
+        skipped += unread
+        retries = 0
+        items += page_items
+        seen.update(item["assetid"] for item in page_items)
 
-        for i, item in enumerate(items[processed_count:]):
+        # slots which never loaded are not counted again by reading the last page again
+        first_page = snapshot["pages"] if unread else max(snapshot["pages"] - 1, 0)
 
-            if 'disabled' not in item.get_attribute('class'):  # check if item slot is empty
+        if last_page:
+            break
 
-                item.click()
-                rhs = driver.find_element(By.CLASS_NAME, 'inventory_page_right')
+        driver.find_element(By.ID, 'pagebtn_next').click()
+        time.sleep(.5)
 
-                # for some reason, the most recent item name and tag elements alternate when clicking a new item
-                if i % 2 == 1:
-                    item_name_element = rhs.find_elements(By.CLASS_NAME, 'hover_item_name')[1]
-                    item_tag_element = rhs.find_elements(By.CSS_SELECTOR, 'span.item_desc_descriptors')[1]
-                else:
-                    item_name_element = rhs.find_elements(By.CLASS_NAME, 'hover_item_name')[0]
-                    item_tag_element = rhs.find_elements(By.CSS_SELECTOR, 'span.item_desc_descriptors')[0]
+    driver.quit()
 
-                item_name = item_name_element.text.strip()
-                item_tag = item_tag_element.text.strip()
+    if skipped:
+        print(f"{skipped} item slots did not load and were skipped, run the import again to include them\n")
 
-                print(f"[{processed_count + 1}] {item_name:^50} -> [{item_tag}]")
-                processed_count += 1
+    if not items:
+        print("The inventory is private or unavailable.")
+        quit(0)
 
-                # check if the item is marketable (has value)
-                if item_tag.split(",")[-1].strip() == "Marketable":
-                    add_item_to_excel(item_name, item_tag, max_row)
-                    max_row += 1
+    return collect_marketable_items(items, start)
 
-            else:
-                flag = False
-                break
 
-            # if last item on the page has been processed (25 per page) find the 'next' button and check if it's disabled
-            if (i + 1) % 25 == 0:
+def scrape_inventory_api(inventory_url, bucket=None):
+    """Retrieves only marketable items from a specified Steam inventory using the inventory JSON endpoint
 
-                next_button = driver.find_element(By.ID, 'pagebtn_next')
+    Items are read in pages of up to 2000 and their condition and rarity are taken from the structured description tags,
+    so no browser is needed. Raises InventoryUnavailableError if the endpoint cannot be used.
 
-                if 'disabled' in next_button.get_attribute('class'):
-                    flag = False
-                    break
+    bucket: optional TokenBucket shared by concurrent imports (batch mode)
 
-                next_button.click()
-                time.sleep(.5)
+    :returns: list of marketable item dictionaries (see build_item)
 
-    driver.quit()
+    """
 
+    start = time.perf_counter()
+
+    steam_id = resolve_steam_id(inventory_url)
+    items = fetch_inventory(steam_id, page_size=config.inventory_page_size, bucket=bucket, catalog=catalog)
+
+    print("Scraping Items...\n")
 
-def add_item_to_excel(item_name, item_tag, max_row):
-    """Adds inventory item into spreadsheet as a new row with necessary information
+    return collect_marketable_items(items, start)
 
-    condition: checks if item has a condition value e.g. weapon, if not then leave blank
-    item_tag: contains information relevant to the item, some examples below
 
-    [Pistol, P250, The Breakout Collection, Normal, Restricted, Factory New, Tradable, Marketable]
-    [Graffiti, Normal, Base Grade, Jungle Green, Tradable, Marketable]
-    [Music Kit, Normal, High Grade, Not Tradable, Not Marketable]
-    [Collectible, Normal, Extraordinary, Not Tradable, Not Marketable]
-    [Container, The Clutch Collection, Normal, Base Grade, Tradable, Marketable]
+def collect_marketable_items(items, start):
+    """Lists every item read from an inventory and keeps the marketable ones
 
-    hence, we focus on index 0 using 'conditional_items_filter' to check if the item is a weapon before subscripting for
-    item condition
+    items: item dictionaries from steam_inventory.parse_item
+    start: time.perf_counter() when the import started, used to report items per second
+
+    :returns: list of marketable item dictionaries (see build_item)
 
     """
 
-    date = f'{datetime.now().strftime("%d/%m/%Y")}'
-    item = item_name
+    marketable_items = []
 
-    split_values = item_tag.split(',')
+    for processed_count, item in enumerate(items, start=1):
 
-    # special Glove/Knife condition cases
-    wear_index = (
-        6 if split_values[0] == "Knife" and len(split_values) >= 9 else
-        3 if split_values[0] == "Gloves" else
-        4 if split_values[0] == "Knife" else
-        5
-    )
+        item_tag = ", ".join(tag for tag in (item["item_type"], item["quality"], item["rarity"], item["condition"]) if tag)
+        print(f"[{processed_count}] {item['name']:^50} -> [{item_tag}]")
 
-    condition = f"{split_values[wear_index] if split_values[0] in conditional_items_filter else ''}"
-    purchase_platform = "Steam"
-    purchase_price = 0.03
-    current_value = 0.03
-    percentage_change = 0.00
-    price_difference = 0.00
-    sold_price = "N/A"
-    updated = "n"
+        if item["marketable"]:
+            marketable_items.append(build_item(item["name"], item["condition"], item["colour"], item["assetid"]))
 
-    data = [date, item, condition, purchase_platform, purchase_price, current_value, percentage_change,
-            price_difference, sold_price, updated]
+    elapsed = time.perf_counter() - start
+    print(f"\nImported {len(items)} items in {elapsed:.1f}s ({len(items) / elapsed if elapsed else 0:.0f} items/s)")
 
-    # create a new row
-    new_row = max_row + 1
+    return marketable_items
 
-    # create new cell in new row and apply cell styling from header row
-    for col_index, cell in enumerate(row_styles, start=1):
-        new_cell = ws.cell(row=new_row, column=col_index, value=None)  # Create an empty cell
-        new_cell._style = copy(row_styles[col_index - 1]._style)  # Copy the styling
 
-    # populate cells with scraped item values
-    for j, new_cell in enumerate(data):
-        ws.cell(row=new_row, column=j + 1, value=data[j])
+def scrape_account(inventory_url, bucket=None):
+    """Scrapes an inventory with the configured backend, falling back to Selenium if the JSON endpoint cannot be used"""
 
-    item_tag_list = item_tag.split(",")
-    item_tag_list_stripped = [s.strip() for s in item_tag_list]
+    import requests
 
-    name_colour = get_color(item_tag_list_stripped)
+    if config.inventory_backend == "api":
+        try:
+            return scrape_inventory_api(inventory_url, bucket)
+        except (InventoryUnavailableError, requests.RequestException) as e:
+            print(f"Inventory endpoint unavailable ({e}), falling back to Selenium\n")
 
-    if name_colour is not None:
-        name_colour_aRGB = RGB_Hex_To_aRGB_Hex(name_colour)
-        name_cell = ws.cell(row=new_row, column=2)  # Assuming item name is in the second column
+    return scrape_inventory(inventory_url + "#730")
 
-        font = Font(color=name_colour_aRGB, bold="yes", name="Open Sans", sz=10)
-        name_cell.font = font
 
+def scrape_accounts(accounts):
+    """Scrapes several inventories in parallel with a bounded pool of workers sharing one rate limit
 
-def apply_difference_formula():
-    """Applies price difference formula to column H"""
+    accounts: list of Steam inventory URLs or SteamID64s
 
-    # applying the formula from row 2 onward
-    for row_index in range(2, ws.max_row + 1):
-        formula_cell = f'H{row_index}'  # The cell in column H for the formula
-        formula = f'=F{row_index}-E{row_index}'  # =Fx-Ex
-        ws[formula_cell] = formula
+    :returns: list of (account, marketable items, seconds taken) in the order of accounts
 
+    """
 
-def save_excel():
-    """Saves the updated Excel file with the original formatting to specified directories"""
+    bucket = TokenBucket(rate=config.inventory_rate)
+
+    def scrape_timed(account):
+        start = time.perf_counter()
+        items = scrape_account(to_inventory_url(account), bucket)
+        return account, items, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=config.inventory_max_workers) as executor:
+        return list(executor.map(scrape_timed, accounts))
+
+
+def to_inventory_url(account):
+    """Converts a SteamID64 into its inventory URL, inventory URLs are returned unchanged"""
+
+    account = account.strip()
+    return f"https://steamcommunity.com/profiles/{account}/inventory/" if account.isdigit() else account
+
+
+def write_accounts_to_excel(results):
+    """Writes each account to its own sheet (a copy of the template) and all accounts to the merged first sheet
+
+    The account of each item is written into the 'Account' column so the merged sheet can be filtered by account. The
+    portfolio store only keeps the merged rows, its account sheets are created when the spreadsheet is rendered.
+
+    """
+
+    merged_ws = None if store_mode else workbook.ws
+    merged_items = []
+
+    if not store_mode:
+        merged_ws.title = "All Accounts"
+
+    for account, items, elapsed in results:
+        name = re.search(r'(\d{17}|/(?:id|profiles)/([\w-]+))', account)
+        account_name = (name.group(2) or name.group(1)) if name else account
+
+        for item in items:
+            item["account"] = account_name
+
+        if not store_mode:
+            account_ws = workbook.wb.copy_worksheet(merged_ws)
+            account_ws.title = account_name[:31]
+            add_items_to_excel(items, workbook.row_writer(account_ws))
+
+        merged_items += items
+        print(f"{account_name}: {len(items)} marketable items in {elapsed:.1f}s")
+
+    add_items_to_excel(merged_items, workbook.row_writer(merged_ws))
+
+
+def build_item(item_name, condition, name_colour, assetid=None):
+    """Item dictionary passed from the scrapers to the spreadsheet writers"""
+
+    return {"name": item_name, "condition": condition, "name_colour": name_colour, "assetid": assetid}
+
+
+def add_items_to_excel(items, writer):
+    """Writes all scraped items into the template spreadsheet starting from the writer's first row (row 2)"""
+
+    for item in items:
+        write_item_row(writer, item)
 
-    wb.save(file_path_local)
 
-    if file_path_desktop is not None:
-        wb.save(file_path_desktop)
+def sync_items_to_excel(items):
+    """Syncs scraped items against the rows of an existing spreadsheet, keeping user-entered data
 
+    Existing rows are matched to live items by asset id, rows without a stored asset id are matched by item name and
+    condition (each row matching one live item, so duplicates are counted). A row matched by name has the item's asset
+    id stored so the next sync can match it by id.
 
-def get_color(tag_list):
-    """Retrieves item rarity colour"""
+    Unmatched live items are appended as new rows, unmatched rows are flagged 'n' in the 'In Inventory' column.
 
-    for item in tag_list:
-        if item.strip() in item_rarities:
-            return item_rarities[item]
-    return None
+    """
+
+    df = workbook.df
+    rows_by_id = {str(assetid): index for index, assetid in df['Asset ID'].items() if not pd.isnull(assetid)}
+    rows_by_name = defaultdict(deque)
+
+    for index, item_name, condition, assetid in zip(df.index, df['Item'], df['Condition'], df['Asset ID']):
+        if pd.isnull(assetid) and not pd.isnull(item_name):
+            rows_by_name[(item_name.strip(), str(condition or '').strip())].append(index)
+
+    new_items, matched = [], set()
+
+    for item in items:
+
+        if item["assetid"] in rows_by_id:
+            matched.add(rows_by_id[item["assetid"]])
+            continue
+
+        name_rows = rows_by_name[(item["name"].strip(), item["condition"].strip())]
+
+        if name_rows:
+            index = name_rows.popleft()
+            matched.add(index)
+
+            if item["assetid"] is not None:
+                df.at[index, 'Asset ID'] = item["assetid"]
+        else:
+            new_items.append(item)
+
+    df['In Inventory'] = ["y" if index in matched else "n" for index in df.index]
+    workbook.write_columns(df, ['Asset ID', 'In Inventory'])
+
+    add_items_to_excel(new_items, workbook.row_writer(start_row=workbook.rows + 2))
+
+    print(f"\nSynced {len(items)} items: {len(matched)} kept, {len(new_items)} added, {len(df) - len(matched)} flagged as "
+          f"no longer in the inventory")
+
+
+def write_item_row(writer, item):
+    """Writes an inventory item as the next row of a RowWriter with necessary information
+
+    item: item dictionary from build_item
+    condition: wear of the item, empty if the item has none
+    name_colour: rarity colour of the item name, None to keep the header styling
+
+    """
+
+    row = writer.next_row
+    values = {
+        'Purchase Date': datetime.now().strftime("%d/%m/%Y"),
+        'Item': item["name"],
+        'Condition': item["condition"],
+        'Purchase Platform': "Steam",
+        'Purchase Price': 0.03,
+        'Current Value [Steam]': 0.03,
+        'Current Value % Change': 0.00,
+        'Price Difference': f'=F{row}-E{row}',  # =Fx-Ex
+        'Sold Price': "N/A",
+        'Current Value Updated': "n",
+        'Asset ID': item["assetid"],
+        'In Inventory': "y",
+    }
+
+    if 'Account' in workbook.columns:
+        values['Account'] = item.get("account")
+
+    fonts = {'Item': rarity_fonts[item["name_colour"]]} if item["name_colour"] is not None else None
+    writer.write_row(values, fonts)
+
+
+def save_excel():
+    """Saves the updated Excel file with the original formatting to specified directories"""
+
+    workbook.save(file_path_local, file_path_desktop)
 
 
 def RGB_Hex_To_aRGB_Hex(RGB_Hex):
@@ -214,58 +357,109 @@ def RGB_Hex_To_aRGB_Hex(RGB_Hex):
     return aRGB_Hex
 
 
+def parse_args():
+    """Command line options, every option left out falls back to its value in config.py"""
+
+    parser = argparse.ArgumentParser(description="Imports a Steam CS2 inventory into a tracking spreadsheet")
+    parser.add_argument("url", nargs="?", help="Steam inventory URL, prompted for when left out (and no accounts set)")
+    parser.add_argument("--accounts", nargs="+", metavar="ACCOUNT",
+                        help="inventory URLs / SteamID64s imported at once [inventory_accounts]")
+    parser.add_argument("--mode", choices=["sync", "rebuild"], help="[inventory_mode]")
+    parser.add_argument("--backend", choices=["api", "selenium"], help="[inventory_backend]")
+    parser.add_argument("--file", metavar="PATH", help="spreadsheet to write [file_path_local]")
+    parser.add_argument("--desktop-file", metavar="PATH", help="second path the spreadsheet is saved to "
+                                                               "[file_path_desktop]")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="DIR", help="also save every response to a cassette directory "
+                                                          "[http_mode, http_cassette_dir]")
+    cassette.add_argument("--replay", metavar="DIR", help="serve the responses recorded in a cassette directory, "
+                                                          "without any network")
+
+    args = parser.parse_args()
+
+    overrides = {
+        "inventory_accounts": args.accounts,
+        "inventory_mode": args.mode,
+        "inventory_backend": args.backend,
+        "file_path_local": args.file,
+        "file_path_desktop": args.desktop_file,
+        "http_mode": "record" if args.record else "replay" if args.replay else None,
+        "http_cassette_dir": args.record or args.replay,
+    }
+
+    for key, value in overrides.items():
+        if value is not None:
+            setattr(config, key, value)
+
+    return args
+
+
 if __name__ == "__main__":
 
-    # user Steam inventory URL input combined with #730 for CS2
-    pattern = r'https://steamcommunity\.com/(id|profiles)/[\w-]+/inventory/'
-    base_url = input("Steam Inventory URL: ")
+    args = parse_args()
 
-    if not re.match(pattern, base_url):
-        print("Invalid URL")
-        quit(0)
+    # several accounts can be imported at once by listing their inventory URLs / SteamID64s in config.inventory_accounts
+    accounts = config.inventory_accounts
+    base_url = None
 
-    base_url += "#730"
+    if not accounts:
+        # user Steam inventory URL input combined with #730 for CS2
+        pattern = r'https://steamcommunity\.com/(id|profiles)/[\w-]+/inventory/'
+        base_url = args.url or input("Steam Inventory URL: ")
+
+        if not re.match(pattern, base_url):
+            print("Invalid URL")
+            quit(0)
 
     # load Excel spreadsheet into workbook
     base_path = config.base_path
     file_path_local = config.file_path_local
     file_path_desktop = config.file_path_desktop
 
-    wb = load_workbook(base_path)
-    ws = wb.active
-
-    # get first row of cells from column A-J so cell in column can inherit styling
-    row_styles = ws[1][:10]
-
-    # valid categories to help filter for wear-able items
-    conditional_items_filter = {"Rifle", "SMG", "Shotgun", "Pistol", "Sniper Rifle", "Knife", "Machinegun", "Gloves"}
-
-    # item rarity colour codes
-    item_rarities = {
-        'Consumer Grade': '#B0C3D9',
-        'Industrial Grade': '#5E98D9',
-        'Mil-Spec Grade': '#4B69FF',
-        'Restricted': '#8847FF',
-        'Classified': '#D32CE6',
-        'Covert': '#EB4B4B',
-        'Extraordinary': '#EB4B4B',
-        'Contraband': '#E4AE33',
-        'Clandestine': '#E4AE33',
-        'UNNAMED': '#ADE55C',
-        'Base Grade': '#B0C3D9',
-        'Medium Grade': '#5E98D9',
-        'High Grade': '#4B69FF',
-        'Remarkable': '#8847FF',
-        'Exotic': '#D32CE6',
-        'Distinguished': '#4B69FF',
-        'Exceptional': '#8847FF',
-        'Superior': '#D32CE6',
-        'Master': '#EB4B4B',
-        'Souvenir': '#FFD700',
-        'StatTrak™': '#CF6A32',
-        '★': '#8650AC'
-    }
+    # rows are kept in the portfolio store instead of the spreadsheet if portfolio_store_path is set
+    store_mode = config.portfolio_store_path is not None
+    portfolio_exists = os.path.exists(file_path_local) or (store_mode and os.path.exists(config.portfolio_store_path))
+
+    # sync into the existing output spreadsheet (or store) if there is one, otherwise start from the template (batch
+    # mode always starts from the template)
+    sync = config.inventory_mode == "sync" and not accounts and portfolio_exists
+
+    workbook = open_portfolio(file_path_local if sync else base_path)
+
+    if store_mode and not sync:
+        workbook.clear()
+
+    workbook.ensure_column('Asset ID', style_column='Item')
+    workbook.ensure_column('In Inventory', style_column='Current Value Updated')
+
+    if accounts:
+        workbook.ensure_column('Account', style_column='Item')
 
-    scrape_inventory()
-    apply_difference_formula()
-    save_excel()
+    # metadata of every item seen, items already described are not read from their tags again
+    catalog = ItemCatalog(config.item_catalog_path)
+
+    # item name font of each rarity colour, created once and shared by every row
+    rarity_fonts = {colour: name_font(RGB_Hex_To_aRGB_Hex(colour)) for colour in set(RARITY_COLOURS.values())}
+
+    if accounts:
+        results = scrape_accounts(accounts)
+        catalog.close()
+        write_accounts_to_excel(results)
+        save_excel()
+        quit(0)
+
+    # read the inventory JSON endpoint, only fall back to clicking through the inventory page if it cannot be used
+    scraped_items = scrape_account(base_url)
+    catalog.close()
+
+    if sync:
+        sync_items_to_excel(scraped_items)
+        save_excel()
+    elif config.inventory_write_only and not store_mode:
+        # rows are streamed into a new workbook built from the template, which is saved by the writer
+        writer = RowWriter(workbook, write_only=True)
+        add_items_to_excel(scraped_items, writer)
+        writer.save(file_path_local, file_path_desktop)
+    else:
+        add_items_to_excel(scraped_items, workbook.row_writer())
+        save_excel()
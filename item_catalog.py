@@ -0,0 +1,256 @@
+import time
+import sqlite3
+import threading
+
+# item rarity colour codes, quality tags (StatTrak™, Souvenir, ★) take precedence over the rarity
+RARITY_COLOURS = {
+    'Consumer Grade': '#B0C3D9',
+    'Industrial Grade': '#5E98D9',
+    'Mil-Spec Grade': '#4B69FF',
+    'Restricted': '#8847FF',
+    'Classified': '#D32CE6',
+    'Covert': '#EB4B4B',
+    'Extraordinary': '#EB4B4B',
+    'Contraband': '#E4AE33',
+    'Clandestine': '#E4AE33',
+    'UNNAMED': '#ADE55C',
+    'Base Grade': '#B0C3D9',
+    'Medium Grade': '#5E98D9',
+    'High Grade': '#4B69FF',
+    'Remarkable': '#8847FF',
+    'Exotic': '#D32CE6',
+    'Distinguished': '#4B69FF',
+    'Exceptional': '#8847FF',
+    'Superior': '#D32CE6',
+    'Master': '#EB4B4B',
+    'Souvenir': '#FFD700',
+    'StatTrak™': '#CF6A32',
+    '★': '#8650AC'
+}
+
+WEARS = ("Factory New", "Minimal Wear", "Field-Tested", "Well-Worn", "Battle-Scarred")
+
+# Type tag of each gun, used for items only known by name
+WEAPON_TYPES = {
+    **dict.fromkeys(["CZ75-Auto", "Desert Eagle", "Dual Berettas", "Five-SeveN", "Glock-18", "P2000", "P250",
+                     "R8 Revolver", "Tec-9", "USP-S"], "Pistol"),
+    **dict.fromkeys(["AK-47", "AUG", "FAMAS", "Galil AR", "M4A1-S", "M4A4", "SG 553"], "Rifle"),
+    **dict.fromkeys(["AWP", "G3SG1", "SCAR-20", "SSG 08"], "Sniper Rifle"),
+    **dict.fromkeys(["MAC-10", "MP5-SD", "MP7", "MP9", "P90", "PP-Bizon", "UMP-45"], "SMG"),
+    **dict.fromkeys(["MAG-7", "Nova", "Sawed-Off", "XM1014"], "Shotgun"),
+    **dict.fromkeys(["M249", "Negev"], "Machinegun"),
+    "Zeus x27": "Equipment",
+}
+
+# Type tag of items only known by name: name prefix / suffix -> type
+NAME_PREFIX_TYPES = {"Sticker | ": "Sticker", "Patch | ": "Patch", "Sealed Graffiti | ": "Graffiti",
+                     "Graffiti | ": "Graffiti", "Music Kit | ": "Music Kit", "Charm | ": "Charm"}
+NAME_SUFFIX_TYPES = {" Key": "Key", " Case": "Container", " Capsule": "Container", " Package": "Container"}
+
+FIELDS = ("item_type", "weapon", "wear", "rarity", "collection", "quality", "stattrak", "souvenir", "colour",
+          "described")
+
+
+def rarity_colour(tag_list):
+    """:returns: rarity colour of the first tag with one e.g. rarity_colour(["StatTrak™", "Covert"]) -> '#CF6A32'"""
+
+    for tag in tag_list:
+        if tag.strip() in RARITY_COLOURS:
+            return RARITY_COLOURS[tag.strip()]
+    return None
+
+
+def split_name(market_hash_name, wear):
+    """
+
+    :returns: (item name without the wear, condition) of a market hash name, the condition is empty if the item has
+    none e.g. ("AK-47 | Redline", "Field-Tested")
+
+    Vanilla knives have an Exterior tag of "Not Painted" but no wear in their market name
+
+    """
+
+    if wear and market_hash_name.endswith(f" ({wear})"):
+        return market_hash_name[:-len(wear) - 3], wear
+    return market_hash_name, ""
+
+
+def describe(tags):
+    """
+
+    Builds a catalog entry from the description tags of an inventory item
+
+    tags: description tags e.g. [{"category": "Type", "localized_tag_name": "Rifle"}, ...]
+
+    """
+
+    tags = {tag["category"]: tag["localized_tag_name"] for tag in tags}
+    quality = tags.get("Quality", "")
+
+    return {
+        "item_type": tags.get("Type", ""),
+        "weapon": tags.get("Weapon", ""),
+        "wear": tags.get("Exterior", ""),
+        "rarity": tags.get("Rarity", ""),
+        "collection": tags.get("ItemSet", ""),
+        "quality": quality,
+        "stattrak": "StatTrak™" in quality,
+        "souvenir": quality == "Souvenir",
+        "colour": rarity_colour([quality, tags.get("Rarity", "")]),
+        "described": True,
+    }
+
+
+def describe_name(market_hash_name):
+    """
+
+    Builds a catalog entry of an item only known by its market hash name (e.g. a spreadsheet row never imported from an
+    inventory), rarity and collection are left empty until the item is seen in an inventory
+
+    """
+
+    name = market_hash_name
+    wear = next((wear for wear in WEARS if name.endswith(f" ({wear})")), "")
+    name = name[:-len(wear) - 3] if wear else name
+
+    star = name.startswith("★ ")
+    name = name.removeprefix("★ ")
+    stattrak = name.startswith("StatTrak™ ")
+    souvenir = name.startswith("Souvenir ") and " | " in name
+    weapon = name.removeprefix("StatTrak™ ").removeprefix("Souvenir " if souvenir else "").split(" | ")[0]
+    quality = " ".join(["★"] * star + ["StatTrak™"] * stattrak) or ("Souvenir" if souvenir else "")
+
+    if star:
+        item_type = "Gloves" if "Gloves" in weapon or "Wraps" in weapon else "Knife"
+    elif weapon in WEAPON_TYPES:
+        item_type = WEAPON_TYPES[weapon]
+    else:
+        weapon = ""
+        item_type = next((item_type for prefix, item_type in NAME_PREFIX_TYPES.items() if name.startswith(prefix)),
+                         next((item_type for suffix, item_type in NAME_SUFFIX_TYPES.items() if name.endswith(suffix)),
+                              "Agent" if " | " in name and not wear else ""))
+
+    return {
+        "item_type": item_type,
+        "weapon": weapon,
+        "wear": wear,
+        "rarity": "",
+        "collection": "",
+        "quality": quality,
+        "stattrak": stattrak,
+        "souvenir": souvenir,
+        "colour": rarity_colour([quality]),
+        "described": False,
+    }
+
+
+class ItemCatalog:
+    """
+
+    Local catalog of item metadata shared by inventory.py and cs2.py, keyed by market hash name
+
+    Entries hold the item's type, weapon, wear, rarity, collection, quality (StatTrak™/Souvenir flags) and name
+    colour. The whole catalog is read into a dictionary when opened, so every lookup is a dictionary access, and entries
+    added while running are only written to the SQLite file on save().
+
+    Items imported from an inventory are described from their tags. Items only seen by name (spreadsheet rows) are
+    described from the name alone, and completed from their tags the first time they are imported.
+
+    path: SQLite file of the catalog
+
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS items (
+                market_hash_name TEXT PRIMARY KEY,
+                {", ".join(f"{field} {'INTEGER' if field in ('stattrak', 'souvenir', 'described') else 'TEXT'}"
+                           for field in FIELDS)},
+                updated_at REAL NOT NULL
+            )
+        """)
+
+        self.entries = {}
+        for row in self.connection.execute(f"SELECT market_hash_name, {', '.join(FIELDS)} FROM items"):
+            entry = dict(zip(FIELDS, row[1:]))
+            entry.update({flag: bool(entry[flag]) for flag in ("stattrak", "souvenir", "described")})
+            self.entries[row[0]] = entry
+
+        # case and spacing insensitive key -> market hash name, corrects the names typed into a spreadsheet
+        self.keys = {self.key(name): name for name in self.entries}
+        self.pending = {}
+
+    @staticmethod
+    def key(name):
+        return " ".join(name.split()).casefold()
+
+    def get(self, market_hash_name):
+        """:returns: catalog entry of an item, None if it is not in the catalog"""
+
+        return self.entries.get(market_hash_name)
+
+    def add(self, market_hash_name, entry):
+        """Adds (or replaces) the entry of an item, saved with save()"""
+
+        key = self.key(market_hash_name)
+
+        with self.lock:
+            self.entries[market_hash_name] = entry
+            self.pending[market_hash_name] = entry
+
+            # an item only known by name never takes over the spelling of an item imported from an inventory
+            if entry["described"] or key not in self.keys:
+                self.keys[key] = market_hash_name
+
+    def describe_tags(self, market_hash_name, tags):
+        """:returns: entry of an inventory item, its description tags are only read if it is not described yet"""
+
+        entry = self.entries.get(market_hash_name)
+
+        if entry is None or not entry["described"]:
+            entry = describe(tags)
+            self.add(market_hash_name, entry)
+
+        return entry
+
+    def learn(self, names):
+        """Adds the items of a list of market hash names which are not in the catalog yet, described by name"""
+
+        for name in names:
+            if name not in self.entries:
+                self.add(name, describe_name(name))
+
+    def market_name(self, name):
+        """:returns: market hash name of an item as spelled in the catalog, the name unchanged if it is not in it"""
+
+        return name if name in self.entries else self.keys.get(self.key(name), name)
+
+    def category(self, name):
+        """:returns: category (Type tag e.g. Rifle, Knife, Sticker) of an item, 'Other' if it is unknown"""
+
+        entry = self.entries.get(name)
+        return (entry and entry["item_type"]) or "Other"
+
+    def save(self):
+        """Writes the entries added since the last save"""
+
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        if not pending:
+            return
+
+        now = time.time()
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO items (market_hash_name, {', '.join(FIELDS)}, updated_at) "
+                f"VALUES ({', '.join('?' * (len(FIELDS) + 2))})",
+                [(name, *(entry[field] for field in FIELDS), now) for name, entry in pending.items()]
+            )
+
+    def close(self):
+        self.save()
+        self.connection.close()
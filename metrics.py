@@ -0,0 +1,122 @@
+import csv
+import json
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+lock = threading.Lock()
+stages = {}
+counters = {}
+requests_by_host = {}
+
+
+@contextmanager
+def stage(name):
+    """Times a stage of a run, stages run more than once have their times summed"""
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def count(name, amount=1):
+    """Adds to a named counter e.g. cache hits or rows updated"""
+
+    with lock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def record_response(response, *args, **kwargs):
+    """
+
+    requests response hook recording every outbound request per host: count, bytes received, time and 429s
+
+    usage: requests.get(url, hooks=metrics.request_hooks)
+
+    """
+
+    host = urlparse(response.url).netloc
+
+    with lock:
+        host_stats = requests_by_host.setdefault(host, {"requests": 0, "bytes": 0, "seconds": 0.0, "status_429": 0})
+        host_stats["requests"] += 1
+        host_stats["bytes"] += len(response.content)
+        host_stats["seconds"] += response.elapsed.total_seconds()
+        host_stats["status_429"] += response.status_code == 429
+
+    return response
+
+
+request_hooks = {"response": record_response}
+
+
+def report():
+    """:returns: dictionary of all stage timings, request statistics and counters recorded so far"""
+
+    with lock:
+        total_requests = {key: sum(host[key] for host in requests_by_host.values())
+                          for key in ("requests", "bytes", "seconds", "status_429")}
+
+        rows = counters.get("rows_updated", 0)
+        update_time = stages.get("update_dataframe", 0.0)
+
+        return {
+            "stages": dict(stages),
+            "requests": total_requests,
+            "requests_by_host": {host: dict(values) for host, values in requests_by_host.items()},
+            "counters": dict(counters),
+            "rows_per_second": rows / update_time if update_time else None,
+        }
+
+
+def write_report(path):
+    """Writes the report to a JSON file, or to a CSV file of (section, name, value) rows if path ends with .csv"""
+
+    data = report()
+
+    if not path.endswith(".csv"):
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        return
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["section", "name", "value"])
+
+        for section, values in data.items():
+            if not isinstance(values, dict):
+                writer.writerow([section, "", values])
+                continue
+
+            for name, value in values.items():
+                if isinstance(value, dict):
+                    for key, item in value.items():
+                        writer.writerow([section, f"{name}.{key}", item])
+                else:
+                    writer.writerow([section, name, value])
+
+
+def print_summary():
+    """Prints stage timings and request totals"""
+
+    data = report()
+
+    print("\nStage timings:")
+    for name, seconds in data["stages"].items():
+        print(f"  {name:<24} {seconds:8.3f}s")
+
+    requests = data["requests"]
+    print(f"\nRequests: {requests['requests']} ({requests['bytes'] / 1e6:.2f} MB, {requests['status_429']} rate limited)")
+
+    for name, value in data["counters"].items():
+        print(f"  {name:<24} {value}")
+
+    if data["rows_per_second"] is not None:
+        print(f"  {'rows/s':<24} {data['rows_per_second']:.0f}")
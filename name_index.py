@@ -0,0 +1,118 @@
+import re
+import math
+import unicodedata
+from collections import defaultdict
+
+# abbreviations sometimes used for the wear in column C
+WEAR_ABBREVIATIONS = {"fn": "factory new", "mw": "minimal wear", "ft": "field tested", "ww": "well worn",
+                      "bs": "battle scarred"}
+
+
+def normalize(name):
+    """
+
+    Normalizes a market hash name so names differing only in spelling details compare equal
+
+    case, ™ and ★ symbols, hyphens, spacing around "|" and repeated spaces are ignored, and a wear abbreviation in
+    brackets is expanded e.g. "stattrak ak47 | redline (FT)" and "StatTrak™ AK-47 | Redline (Field-Tested)" both become
+    "stattrak ak 47 | redline (field tested)"
+
+    """
+
+    name = unicodedata.normalize("NFKC", name.replace("™", "").replace("★", "")).casefold()
+    name = re.sub(r"(?<=[a-z])(?=\d)", " ", name.replace("-", " "))
+    name = re.sub(r"\s*\|\s*", " | ", name)
+    name = re.sub(r"\s*\(\s*", " (", re.sub(r"\s*\)\s*", ")", name))
+    name = re.sub(r"\s+", " ", name).strip()
+
+    match = re.search(r"\(([a-z]{2})\)$", name)
+    if match and match.group(1) in WEAR_ABBREVIATIONS:
+        name = name[:match.start()] + f"({WEAR_ABBREVIATIONS[match.group(1)]})"
+
+    return name
+
+
+def variant(normalized):
+    """:returns: the parts of a normalized name that must match exactly: StatTrak/Souvenir and the wear in brackets"""
+
+    wear = re.search(r"\(([^()]*)\)$", normalized)
+
+    return "stattrak" in normalized, "souvenir" in normalized, wear.group(1) if wear else None
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+
+    Index of the item names of a bulk price feed resolving names that do not exactly match a feed key
+
+    Names are first looked up by their normalized form, then by trigram similarity (Dice coefficient) against feed
+    names of the same variant only, so a near-miss never resolves to a StatTrak, Souvenir or other wear version with a
+    different price. A fuzzy match is only accepted if no other name is about as similar.
+
+    Candidates are taken from the postings of the query's rarest trigrams only: a name sharing none of them cannot
+    reach the threshold, so common trigrams ("ak ", " | ") never have to be scanned.
+
+    names: feed keys (market hash names)
+    threshold: lowest similarity (0-1) accepted as a match
+    margin: how much more similar the best match has to be than the second best
+
+    """
+
+    def __init__(self, names, threshold=0.85, margin=0.03):
+        self.threshold = threshold
+        self.margin = margin
+        self.normalized = {}
+
+        # variant -> (feed names, trigram sets, trigram -> positions of the names containing it)
+        self.partitions = defaultdict(lambda: ([], [], defaultdict(list)))
+
+        for name in names:
+            normalized = normalize(name)
+            self.normalized.setdefault(normalized, name)
+
+            partition_names, partition_grams, postings = self.partitions[variant(normalized)]
+            grams = trigrams(normalized)
+
+            for gram in grams:
+                postings[gram].append(len(partition_names))
+
+            partition_names.append(name)
+            partition_grams.append(grams)
+
+    def resolve(self, name):
+        """:returns: (feed name, similarity) of the best match for name, or None if nothing is similar enough"""
+
+        normalized = normalize(name)
+
+        if normalized in self.normalized:
+            return self.normalized[normalized], 1.0
+
+        wanted = variant(normalized)
+
+        if wanted not in self.partitions:
+            return None
+
+        names, grams, postings = self.partitions[wanted]
+        query = trigrams(normalized)
+
+        # a name needs at least this many shared trigrams to reach the threshold, so it must contain one of the
+        # len(query) - min_shared + 1 rarest trigrams of the query
+        min_shared = math.ceil(self.threshold * len(query) / (2 - self.threshold))
+        rarest = sorted(query, key=lambda gram: len(postings.get(gram, ())))[:len(query) - min_shared + 1]
+        candidates = {number for gram in rarest for number in postings.get(gram, ())}
+
+        scores = sorted((2 * len(query & grams[number]) / (len(query) + len(grams[number])), number)
+                        for number in candidates)
+
+        if not scores or scores[-1][0] < self.threshold:
+            return None
+
+        if len(scores) > 1 and scores[-1][0] - scores[-2][0] < self.margin:
+            return None
+
+        return names[scores[-1][1]], scores[-1][0]
@@ -0,0 +1,394 @@
+"""SQLite portfolio store read and written by cs2.py and inventory.py in place of the spreadsheet
+
+python portfolio_store.py                          renders file_path_local (and file_path_desktop) from the store
+python portfolio_store.py --output report.xlsx     renders to another file
+python portfolio_store.py --import portfolio.xlsx  replaces the contents of the store with a spreadsheet (e.g. edited)
+"""
+
+import os
+import sqlite3
+import argparse
+import pandas as pd
+from datetime import datetime
+import config
+from openpyxl.utils import get_column_letter
+from workbook import PortfolioWorkbook, SUMMARY_COLUMNS, changed_rows, name_font
+
+
+def quote(name):
+    """:returns: quoted SQL identifier of a column header, e.g. for columns with spaces or brackets"""
+
+    return '"' + name.replace('"', '""') + '"'
+
+
+def font_colour(font):
+    """:returns: aRGB colour of a font e.g. FFD32CE6, None if there is no font or it has no plain RGB colour"""
+
+    if font is None or font.color is None or font.color.type != "rgb":
+        return None
+
+    return font.color.rgb
+
+
+class PortfolioStore:
+    """
+
+    Portfolio kept in SQLite, with the same interface as PortfolioWorkbook (df, columns, rows, number_formats,
+    ensure_column, write_columns, set_cell, row_writer, save), so cs2.py and inventory.py work on either
+
+    Loading reads one table and saving only writes the values that changed, instead of parsing and serialising the whole
+    workbook. The styled spreadsheet is generated from the store by render(), on demand or on every save with
+    portfolio_render.
+
+    items: one row per item: "row" (spreadsheet row number), the rarity colour of the item name and one column per
+        spreadsheet column header
+    columns: spreadsheet column header -> column number, header whose styling an added column copies, number format and
+        whether the column holds dates and times (stored as ISO text)
+    cells: summary box cells written by the scripts (M1, L3) -> value
+
+    path: SQLite file
+    import_path: spreadsheet the store is created from if it is empty (base_path for an empty portfolio)
+
+    """
+
+    def __init__(self, path, import_path=None):
+        self.path = path
+        # cs2.py saves from a worker thread, the store is still only used by one thread at a time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS columns (
+                name TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                style_column TEXT,
+                number_format TEXT,
+                is_datetime INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS cells (coordinate TEXT PRIMARY KEY, value)")
+
+        if self.connection.execute("SELECT COUNT(*) FROM columns").fetchone()[0] == 0:
+            self.import_workbook(PortfolioWorkbook(import_path if import_path is not None and
+                                                   os.path.exists(import_path) else config.base_path))
+        else:
+            self.load()
+
+    def import_workbook(self, workbook):
+        """
+
+        Replaces the contents of the store with the item rows, item name colours and summary cells of a spreadsheet
+
+        Columns added after the summary boxes keep the styling of the template column whose header they were copied from
+        and the number format of their first value
+
+        """
+
+        ws = workbook.ws
+        item_column = workbook.columns['Item']
+        header_colour = font_colour(ws.cell(row=1, column=item_column).font)
+        template_columns = {name: position for name, position in workbook.columns.items()
+                            if position < min(SUMMARY_COLUMNS)}
+
+        self.datetime_columns = {name for name in workbook.columns
+                                 if any(isinstance(value, datetime) for value in workbook.df[name])}
+
+        with self.connection:
+            self.connection.execute("DELETE FROM columns")
+            self.connection.execute("DELETE FROM cells")
+            self.connection.execute("DROP TABLE IF EXISTS items")
+            self.connection.execute(f"CREATE TABLE items (row INTEGER PRIMARY KEY, item_colour TEXT, "
+                                    f"{', '.join(quote(name) for name in workbook.columns)})")
+
+            for name, position in workbook.columns.items():
+                style_column = number_format = None
+
+                if name not in template_columns:
+                    header = ws.cell(row=1, column=position)
+                    width = ws.column_dimensions[header.column_letter].width
+                    style_column = next((template_name for template_name, template_position in template_columns.items()
+                                         if ws.cell(row=1, column=template_position)._style == header._style and
+                                         ws.column_dimensions[get_column_letter(template_position)].width == width),
+                                        'Item')
+                    first = ws.cell(row=2, column=position)
+                    number_format = first.number_format if first.number_format != "General" else None
+
+                self.connection.execute(
+                    "INSERT INTO columns (name, position, style_column, number_format, is_datetime) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (name, position, style_column, number_format, name in self.datetime_columns)
+                )
+
+            colours = [font_colour(ws.cell(row=row, column=item_column).font) for row in range(2, workbook.rows + 2)]
+            self.insert_rows(workbook.df.to_dict("records"), [None if colour == header_colour else colour
+                                                              for colour in colours], list(workbook.columns))
+
+            self.connection.executemany("INSERT INTO cells (coordinate, value) VALUES (?, ?)",
+                                        [(coordinate, ws[coordinate].value) for coordinate in ("M1", "L3")])
+
+        self.load()
+
+    def load(self):
+        """Reads the column definitions and item rows into columns, number_formats and df"""
+
+        definitions = self.connection.execute(
+            "SELECT name, position, style_column, number_format, is_datetime FROM columns ORDER BY position"
+        ).fetchall()
+
+        self.columns = {name: position for name, position, _, _, _ in definitions}
+        self.style_columns = {name: style_column for name, _, style_column, _, _ in definitions if style_column}
+        self.number_formats = {name: number_format for name, _, _, number_format, _ in definitions if number_format}
+        self.datetime_columns = {name for name, _, _, _, is_datetime in definitions if is_datetime}
+
+        self.df = self.read_items().drop(columns="item_colour")
+        self.rows = len(self.df)
+        self.original = self.df.copy()
+
+    def read_items(self):
+        """:returns: dataframe of the item rows in spreadsheet order with the item_colour column"""
+
+        names = ', '.join(quote(name) for name in self.columns)
+        df = pd.read_sql(f"SELECT item_colour, {names} FROM items ORDER BY row", self.connection)
+
+        for name in self.datetime_columns:
+            df[name] = pd.to_datetime(df[name])
+
+        return df
+
+    def encode(self, name, value):
+        """:returns: value as stored in SQLite, dates and times are stored as ISO text and mark their column"""
+
+        if pd.isnull(value):
+            return None
+
+        if isinstance(value, datetime):
+            if name not in self.datetime_columns:
+                self.datetime_columns.add(name)
+                self.connection.execute("UPDATE columns SET is_datetime = 1 WHERE name = ?", (name,))
+
+            return value.isoformat(sep=" ")
+
+        return value
+
+    def insert_rows(self, rows, colours, names, start_row=2):
+        """Inserts item rows (dictionaries of column header -> value) with their item name colours from start_row"""
+
+        self.connection.executemany(
+            f"INSERT INTO items (row, item_colour, {', '.join(quote(name) for name in names)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(names))})",
+            [(row_number, colour, *(self.encode(name, row.get(name)) for name in names))
+             for row_number, row, colour in zip(range(start_row, start_row + len(rows)), rows, colours)]
+        )
+
+    def write_columns(self, df, names):
+        """
+
+        Writes the given dataframe columns back to the store, only values which changed are written
+
+        :returns: number of values written
+
+        """
+
+        written = 0
+
+        for name in names:
+            new_values = df[name].tolist()
+            changed = changed_rows(self.original[name].tolist(), new_values)
+
+            self.connection.executemany(f"UPDATE items SET {quote(name)} = ? WHERE row = ?",
+                                        [(self.encode(name, new_values[i]), i + 2) for i in changed])
+
+            self.original[name] = df[name].copy()
+            written += len(changed)
+
+        return written
+
+    def ensure_column(self, name, style_column, number_format=None):
+        """
+
+        Adds a column after the summary boxes if the store does not have it yet, see PortfolioWorkbook.ensure_column
+
+        The styling column and number format are kept for render()
+
+        """
+
+        if number_format is not None:
+            self.number_formats[name] = number_format
+
+        self.style_columns.setdefault(name, style_column)
+
+        if name not in self.columns:
+            position = max(*self.columns.values(), *SUMMARY_COLUMNS) + 1
+            self.connection.execute(f"ALTER TABLE items ADD COLUMN {quote(name)}")
+            self.columns[name] = position
+            self.df[name] = None
+            self.original[name] = None
+
+        self.connection.execute(
+            "INSERT INTO columns (name, position, style_column, number_format) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET style_column = excluded.style_column, "
+            "number_format = COALESCE(excluded.number_format, number_format)",
+            (name, self.columns[name], self.style_columns[name], number_format)
+        )
+
+    def set_cell(self, coordinate, value):
+        """Stores a summary box cell written into the rendered spreadsheet e.g. set_cell("L3", "01/01/2024 at 12:00")"""
+
+        self.connection.execute("INSERT OR REPLACE INTO cells (coordinate, value) VALUES (?, ?)", (coordinate, value))
+
+    def row_writer(self, ws=None, start_row=None):
+        """:returns: StoreRowWriter appending item rows from start_row (after the last row if None)"""
+
+        if ws is not None:
+            raise ValueError("a portfolio store has a single sheet, account sheets are created by render()")
+
+        return StoreRowWriter(self, start_row if start_row is not None else self.rows + 2)
+
+    def clear(self):
+        """Removes every item row and summary cell, as when starting again from the template"""
+
+        self.connection.execute("DELETE FROM items")
+        self.connection.execute("DELETE FROM cells")
+        self.df = self.df.iloc[0:0]
+        self.rows = 0
+        self.original = self.df.copy()
+
+    def save(self, *paths):
+        """
+
+        Commits the changes to the store, the spreadsheet is also rendered to every path given (None paths are skipped)
+        if portfolio_render is set
+
+        """
+
+        self.connection.commit()
+
+        if config.portfolio_render:
+            self.render(*paths)
+
+    def render(self, *paths):
+        """
+
+        Generates the styled spreadsheet from the store and saves it to every path given, None paths are skipped
+
+        Rows are written from base_path the way inventory.py writes them: header styling, rarity coloured item names,
+        Price Difference formulas and the added columns with their number formats, followed by the summary cells. If the
+        portfolio has an Account column (batch mode), the rows are written to an "All Accounts" sheet and each account
+        also gets its own sheet.
+
+        """
+
+        items = self.read_items()
+        workbook = PortfolioWorkbook(config.base_path)
+
+        for name in self.columns:
+            if name not in workbook.columns:
+                workbook.ensure_column(name, self.style_columns.get(name, 'Item'), self.number_formats.get(name))
+
+        sheets = [(workbook.ws, items)]
+
+        if 'Account' in items and items['Account'].notna().any():
+            workbook.ws.title = "All Accounts"
+
+            # account sheets are copies of the template sheet before any row is written
+            sheets += [(workbook.wb.copy_worksheet(workbook.ws), account_items)
+                       for _, account_items in items.groupby('Account', sort=False)]
+
+            for ws, account_items in sheets[1:]:
+                ws.title = str(account_items['Account'].iloc[0])[:31]
+
+        fonts = {}
+
+        for ws, sheet_items in sheets:
+            writer = workbook.row_writer(ws)
+
+            for item in sheet_items.to_dict("records"):
+                colour = item.pop("item_colour")
+                values = {name: None if pd.isnull(value) else value for name, value in item.items()}
+                values['Price Difference'] = f'=F{writer.next_row}-E{writer.next_row}'  # =Fx-Ex
+
+                if colour is not None and colour not in fonts:
+                    fonts[colour] = name_font(colour)
+
+                writer.write_row(values, {'Item': fonts[colour]} if colour is not None else None)
+
+        for coordinate, value in self.connection.execute("SELECT coordinate, value FROM cells"):
+            workbook.set_cell(coordinate, value)
+
+        workbook.save(*paths)
+
+    def close(self):
+        self.connection.close()
+
+
+class StoreRowWriter:
+    """
+
+    Appends whole item rows to a PortfolioStore, with the interface of workbook.RowWriter
+
+    The rarity colour of the item name is taken from the Item font and kept for render()
+
+    """
+
+    def __init__(self, store, start_row):
+        self.store = store
+        self.next_row = start_row
+
+    def write_row(self, values, fonts=None):
+        """:returns: row number written, see RowWriter.write_row"""
+
+        row = self.next_row
+        self.next_row += 1
+
+        font = (fonts or {}).get('Item')
+        self.store.insert_rows([values], [font_colour(font)], list(values), start_row=row)
+
+        return row
+
+
+def open_portfolio(path):
+    """
+
+    Opens the portfolio the scripts read and write
+
+    :returns: PortfolioStore of portfolio_store_path if it is set (created from the spreadsheet at path the first time),
+        otherwise PortfolioWorkbook of the spreadsheet at path
+
+    """
+
+    if config.portfolio_store_path is None:
+        return PortfolioWorkbook(path)
+
+    return PortfolioStore(config.portfolio_store_path, import_path=path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", metavar="PATH", default=config.portfolio_store_path,
+                        help="SQLite portfolio store [portfolio_store_path]")
+    parser.add_argument("--output", metavar="PATH", help="spreadsheet rendered [file_path_local, file_path_desktop]")
+    parser.add_argument("--import", dest="import_path", metavar="PATH",
+                        help="spreadsheet whose rows replace the contents of the store, nothing is rendered")
+    args = parser.parse_args()
+
+    if args.store is None:
+        parser.error("no portfolio store, set portfolio_store_path in config.py or pass --store")
+
+    if args.import_path:
+        # a new store is filled from the spreadsheet when it is created
+        created = not os.path.exists(args.store)
+        store = PortfolioStore(args.store, import_path=args.import_path)
+
+        if not created:
+            store.import_workbook(PortfolioWorkbook(args.import_path))
+
+        print(f"Imported {store.rows} items from {args.import_path} into {args.store}")
+    else:
+        store = PortfolioStore(args.store, import_path=config.file_path_local)
+        paths = [args.output] if args.output else [config.file_path_local, config.file_path_desktop]
+        store.render(*paths)
+        print(f"Rendered {store.rows} items from {args.store} to {', '.join(path for path in paths if path)}")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
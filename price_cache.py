@@ -0,0 +1,84 @@
+import time
+import sqlite3
+import threading
+
+
+class PriceCache:
+    """
+
+    Persistent price cache shared between runs of cs2.py
+
+    Prices are keyed by (market_hash_name, source option, currency) and stored with the time they were fetched.
+    A price is fresh while it is younger than the TTL of its source option.
+
+    ttls: dictionary of source option -> seconds a price stays fresh
+    max_age: entries older than this (seconds) are removed on eviction regardless of source
+    max_entries: the most recently fetched entries kept on eviction
+
+    """
+
+    def __init__(self, path, ttls, max_age, max_entries):
+        self.ttls = ttls
+        self.max_age = max_age
+        self.max_entries = max_entries
+
+        # option F looks up and stores the prices of each source from its own thread, on the same connection
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS prices (
+                name TEXT NOT NULL,
+                option TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                price REAL NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (name, option, currency)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS prices_fetched_at ON prices (fetched_at)")
+
+    def get_fresh(self, names, option, currency):
+        """:returns: dictionary of item name -> price for the names which have a fresh cached price"""
+
+        oldest = time.time() - self.ttls[option]
+        fresh = {}
+
+        # query in chunks to stay under SQLite's host parameter limit
+        names = list(names)
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT name, price FROM prices WHERE option = ? AND currency = ? AND fetched_at >= ? "
+                    f"AND name IN ({','.join('?' * len(chunk))})",
+                    (option, currency, oldest, *chunk)
+                ).fetchall()
+
+            fresh.update(rows)
+
+        return fresh
+
+    def put_many(self, prices, option, currency):
+        """Stores successfully fetched prices (dictionary of item name -> price)"""
+
+        now = time.time()
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO prices (name, option, currency, price, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                [(name, option, currency, price, now) for name, price in prices.items()]
+            )
+
+    def evict(self):
+        """Removes entries older than max_age, then all but the max_entries most recently fetched entries"""
+
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM prices WHERE fetched_at < ?", (time.time() - self.max_age,))
+            self.connection.execute(
+                "DELETE FROM prices WHERE rowid NOT IN (SELECT rowid FROM prices ORDER BY fetched_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def close(self):
+        self.connection.close()
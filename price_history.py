@@ -0,0 +1,166 @@
+import os
+import shutil
+import warnings
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+import config
+
+# windows (in days) of the change metrics, and of the min/max/volatility metrics
+CHANGE_WINDOWS = (1, 7, 30)
+RANGE_WINDOW = 30
+
+
+def partition_dir(option, currency):
+    """History of each option/currency pair is stored separately: <price_history_dir>/<option>_<currency>/"""
+
+    return os.path.join(config.price_history_dir, f"{option}_{currency}")
+
+
+def append(prices, option, currency, when=None):
+    """
+
+    Appends successfully fetched prices (dictionary of item name -> price) to today's partition
+
+    Each call writes one small array file into the day's directory, past days are merged into a single file by
+    compact()
+
+    """
+
+    if not prices:
+        return
+
+    when = when or datetime.now()
+    directory = os.path.join(partition_dir(option, currency), when.strftime("%Y-%m-%d"))
+    os.makedirs(directory, exist_ok=True)
+
+    np.savez(
+        os.path.join(directory, f"{when.strftime('%H%M%S%f')}.npz"),
+        names=np.array(list(prices), dtype=str),
+        prices=np.array(list(prices.values()), dtype=np.float64),
+        timestamps=np.full(len(prices), when.timestamp(), dtype=np.float64),
+    )
+
+
+def read_arrays(paths):
+    """:returns: concatenated names, prices and timestamps arrays of the given array files"""
+
+    arrays = [np.load(path) for path in paths]
+
+    if not arrays:
+        return np.array([], dtype=str), np.array([], dtype=np.float64), np.array([], dtype=np.float64)
+
+    return tuple(np.concatenate([a[key] for a in arrays]) for key in ("names", "prices", "timestamps"))
+
+
+def compact(option, currency, today=None):
+    """Merges the run files of every day before today into one file per day"""
+
+    base = partition_dir(option, currency)
+    today = (today or datetime.now()).strftime("%Y-%m-%d")
+
+    if not os.path.isdir(base):
+        return
+
+    for day in os.listdir(base):
+        directory = os.path.join(base, day)
+
+        if day >= today or not os.path.isdir(directory):
+            continue
+
+        paths = [os.path.join(directory, file) for file in sorted(os.listdir(directory))]
+        existing = os.path.join(base, f"{day}.npz")
+
+        if os.path.exists(existing):
+            paths.insert(0, existing)
+
+        names, prices, timestamps = read_arrays(paths)
+        np.savez(f"{existing}.tmp.npz", names=names, prices=prices, timestamps=timestamps)
+        os.replace(f"{existing}.tmp.npz", existing)
+        shutil.rmtree(directory)
+
+
+def load(option, currency, days, now=None):
+    """
+
+    Loads the history of the last days days, only the partitions of those days are read
+
+    :returns: DataFrame with columns name, price, timestamp and day (local date of the partition the price is stored
+    in, midnight timestamps)
+
+    """
+
+    base = partition_dir(option, currency)
+    now = now or datetime.now()
+    columns = {"name": [], "price": [], "timestamp": [], "day": []}
+
+    for offset in range(days + 1):
+        day = (now - timedelta(days=offset)).strftime("%Y-%m-%d")
+        compacted, directory = os.path.join(base, f"{day}.npz"), os.path.join(base, day)
+        paths = []
+
+        if os.path.exists(compacted):
+            paths.append(compacted)
+        if os.path.isdir(directory):
+            paths += [os.path.join(directory, file) for file in os.listdir(directory)]
+
+        for key, values in zip(("name", "price", "timestamp"), read_arrays(paths)):
+            columns[key].append(values)
+        columns["day"].append(np.full(len(columns["name"][-1]), np.datetime64(day, "ns")))
+
+    return pd.DataFrame({key: np.concatenate(values) for key, values in columns.items()})
+
+
+def window_metrics(option, currency, now=None):
+    """
+
+    Computes change and range metrics for every item in the history in one pass
+
+    The history is reduced to the last price of each item per day, forward filled over days without a fetch, giving a
+    days x items price matrix. All metrics are then column operations on that matrix:
+
+    change_<n>d: change between the latest price and the price n days before (fraction, like Current Value % Change)
+    min_30d/max_30d: lowest/highest daily price over the last 30 days
+    volatility_30d: standard deviation of daily changes over the last 30 days
+
+    :returns: DataFrame indexed by item name
+
+    """
+
+    now = now or datetime.now()
+    history = load(option, currency, max(*CHANGE_WINDOWS, RANGE_WINDOW), now)
+    columns = [f"change_{days}d" for days in CHANGE_WINDOWS] + \
+              [f"min_{RANGE_WINDOW}d", f"max_{RANGE_WINDOW}d", f"volatility_{RANGE_WINDOW}d"]
+
+    if history.empty:
+        return pd.DataFrame(columns=columns, dtype=float)
+
+    # days are the local days of the partitions, like now, not the UTC days of the timestamps
+    history = history.sort_values("timestamp")
+
+    days = pd.date_range(end=pd.Timestamp(now).normalize(), periods=max(*CHANGE_WINDOWS, RANGE_WINDOW) + 1, freq="D")
+    daily = history.pivot_table(index="day", columns="name", values="price", aggfunc="last").reindex(days).ffill()
+    matrix = daily.to_numpy()
+    latest = matrix[-1]
+
+    metrics = {}
+
+    # items without prices over a whole window give NaN metrics, numpy warns about those
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        for window in CHANGE_WINDOWS:
+            previous = matrix[-1 - window]
+            metrics[f"change_{window}d"] = (latest - previous) / previous
+
+        recent = matrix[-RANGE_WINDOW - 1:]
+        metrics[f"min_{RANGE_WINDOW}d"] = np.nanmin(recent, axis=0)
+        metrics[f"max_{RANGE_WINDOW}d"] = np.nanmax(recent, axis=0)
+
+        daily_changes = np.diff(recent, axis=0) / recent[:-1]
+        valid = np.sum(~np.isnan(daily_changes), axis=0)
+        volatility = np.nanstd(daily_changes, axis=0, ddof=1)
+        metrics[f"volatility_{RANGE_WINDOW}d"] = np.where(valid > 1, volatility, np.nan)
+
+    return pd.DataFrame(metrics, index=daily.columns)[columns]
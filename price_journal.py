@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+
+
+class PriceJournal:
+    """
+
+    Append-only journal of the prices fetched by a repricing run of cs2.py, so an interrupted run can be resumed
+
+    Every price is appended to the journal as soon as it is fetched, while the price cache, price history and workbook
+    are only written once all prices are in. A run that is stopped, killed or cut short keeps its journal, resuming
+    replays it so only the items still missing are fetched again. The journal is removed once the run has been saved.
+
+    journal format (one JSON object per line, a line cut off by a kill is ignored):
+    {"run": {"files": ["/home/user/portfolio.xlsx"], "option": "a", "currency": "GBP"}, "started_at": 1700000000.0}
+    {"file": "/home/user/portfolio.xlsx", "old_values": {"AK-47 | Redline (Field-Tested)": 4.02, ...}}
+    {"file": "/home/user/portfolio.xlsx", "expected_profit": 152.3}
+    {"source": "a", "name": "AK-47 | Redline (Field-Tested)", "price": 4.22}
+
+    path: journal file
+    checkpoint_interval: seconds between partial saves of the workbook while prices are fetched (0 for none)
+
+    """
+
+    def __init__(self, path, checkpoint_interval=0):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        # held while writing lines, the sources of option F record their prices from separate threads
+        self.lock = threading.Lock()
+        self.file = None
+        self.replayed = {}
+        self.replayed_old_values = {}
+        self.replayed_expected_profits = {}
+        self.last_checkpoint = time.monotonic()
+
+    def start(self, run, resume=False):
+        """
+
+        Starts journaling a run, an existing journal is replaced unless resume is set and it was written by the same run
+        (same spreadsheets, option and currency)
+
+        run: dictionary describing the run
+
+        :returns: number of prices replayed from the journal
+
+        """
+
+        if not resume and os.path.exists(self.path):
+            print(f"Starting again, the journal of an interrupted run in {self.path} is replaced (see --resume)\n")
+
+        self.replayed, self.replayed_old_values, self.replayed_expected_profits = \
+            self.read(run) if resume else ({}, {}, {})
+        self.last_checkpoint = time.monotonic()
+
+        if self.replayed:
+            self.file = open(self.path, "a", encoding="utf-8")
+        else:
+            self.file = open(self.path, "w", encoding="utf-8")
+            self.write({"run": run, "started_at": time.time()})
+            self.file.flush()
+
+        return sum(map(len, self.replayed.values()))
+
+    def read(self, run):
+        """
+
+        Reads the journal of the run being resumed
+
+        :returns: (dictionary of source -> {item name -> price}, dictionary of spreadsheet -> {item name -> value before
+            the run}, dictionary of spreadsheet -> expected profit before the run), all empty if the journal belongs to
+            another run
+
+        """
+
+        if not os.path.exists(self.path):
+            print("No interrupted run to resume\n")
+            return {}, {}, {}
+
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        entries = []
+
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+
+        if not entries or entries[0].get("run") != run:
+            print(f"The journal in {self.path} is of another run, starting again\n")
+            return {}, {}, {}
+
+        prices, old_values, expected_profits = defaultdict(dict), defaultdict(dict), {}
+
+        for entry in entries[1:]:
+            if "old_values" in entry:
+                old_values[entry["file"]] = entry["old_values"] | old_values[entry["file"]]
+            elif "expected_profit" in entry:
+                expected_profits.setdefault(entry["file"], entry["expected_profit"])
+            else:
+                prices[entry["source"]][entry["name"]] = entry["price"]
+
+        return dict(prices), dict(old_values), expected_profits
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry, default=float) + "\n")
+
+    def old_values(self, file, values):
+        """
+
+        Records the value each item's % change is taken against, before checkpoints overwrite it in the spreadsheet
+
+        file: spreadsheet the values are from
+        values: dictionary of item name -> current value before repricing
+
+        :returns: values, with the values recorded by the interrupted run being resumed in their place
+
+        """
+
+        values = values | self.replayed_old_values.get(file, {})
+
+        with self.lock:
+            self.write({"file": file, "old_values": values})
+            self.file.flush()
+
+        return values
+
+    def old_expected_profit(self, file, expected_profit):
+        """
+
+        Records the expected profit cell M1's % change is taken against, before checkpoints change it in the spreadsheet
+
+        :returns: expected_profit, or the expected profit recorded by the interrupted run being resumed
+
+        """
+
+        expected_profit = self.replayed_expected_profits.get(file, expected_profit)
+
+        with self.lock:
+            self.write({"file": file, "expected_profit": expected_profit})
+            self.file.flush()
+
+        return expected_profit
+
+    def record(self, prices, source):
+        """Appends successfully fetched prices (dictionary of item name -> price) of a source option"""
+
+        if not prices or self.file is None:
+            return
+
+        with self.lock:
+            for name, price in prices.items():
+                self.write({"source": source, "name": name, "price": price})
+
+            # flushed to the OS right away so the prices survive the process being killed
+            self.file.flush()
+
+    def replayed_prices(self, source, names):
+        """:returns: dictionary of item name -> price of the names whose price was replayed from the journal"""
+
+        replayed = self.replayed.get(source, {})
+
+        return {name: replayed[name] for name in names if name in replayed}
+
+    def checkpoint_due(self):
+        """:returns: True if a partial save of the workbook is due, the next is then due checkpoint_interval later"""
+
+        if not self.checkpoint_interval or time.monotonic() - self.last_checkpoint < self.checkpoint_interval:
+            return False
+
+        self.last_checkpoint = time.monotonic()
+        return True
+
+    def finish(self):
+        """Removes the journal of a run whose prices have all been saved"""
+
+        self.close()
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        self.replayed, self.replayed_old_values, self.replayed_expected_profits = {}, {}, {}
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,105 @@
+import time
+import threading
+
+
+class RateLimitedError(Exception):
+    """Raised when an endpoint answers with error 429"""
+
+    def __init__(self, retry_after=None):
+        super().__init__("Rate Limited!")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Thread-safe token bucket which learns the accepted request rate of an endpoint
+
+    rate: tokens (requests) added per second
+    capacity: maximum number of tokens that can be stored, i.e. the largest burst allowed
+    min_rate/max_rate: bounds for the learnt rate
+    increase: rate added after every successful request (additive increase)
+    decrease: factor applied to the rate after every 429 (multiplicative decrease)
+    growth: factor the rate grows by after every successful request until the first 429 (slow start), so the limit is
+    found within a few dozen requests instead of hundreds
+
+    Callers block in acquire() only for as long as it takes the next token to become available, so there are no fixed
+    sleeps between requests. When a 429 is reported, the rate is cut and every caller is paused until the Retry-After
+    window has passed.
+
+    """
+
+    def __init__(self, rate=1.0, capacity=1, min_rate=0.05, max_rate=20.0, increase=0.05, decrease=0.5, growth=1.1):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.growth = growth
+        self.slow_start = True
+
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until a token is available and consumes it"""
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self._refill(now)
+
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+
+                    wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def on_success(self):
+        """Increases the rate after a request was accepted, multiplicatively until the first 429 then additively"""
+
+        with self.lock:
+            rate = self.rate * self.growth if self.slow_start else self.rate + self.increase
+            self.rate = min(self.max_rate, rate)
+
+    def on_rate_limited(self, retry_after=None):
+        """Multiplicatively decreases the rate and pauses all callers after error 429
+
+        retry_after: seconds to wait as given by the Retry-After header, if the endpoint sent one
+
+        """
+
+        with self.lock:
+            now = time.monotonic()
+
+            # requests already in flight when the first 429 arrived should not cut the rate again
+            if now >= self.paused_until:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.slow_start = False
+
+            wait = retry_after if retry_after is not None else 1 / self.rate
+            self.paused_until = max(self.paused_until, now + wait)
+            self.tokens = 0
+            self.updated = max(now, self.paused_until)
+
+
+def parse_retry_after(response):
+    """Retrieves the Retry-After header of a response in seconds, None if missing or not numeric"""
+
+    value = response.headers.get("Retry-After")
+
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
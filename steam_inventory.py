@@ -0,0 +1,243 @@
+import re
+import time
+import http_transport
+from item_catalog import describe, split_name
+from rate_limiter import RateLimitedError, parse_retry_after
+
+STEAM_COMMUNITY_URL = "https://steamcommunity.com"
+
+# run in the inventory page with Selenium (driver.execute_script(INVENTORY_SNAPSHOT_SCRIPT, first_page)), returns the
+# HTML of the CS2 inventory pages built from first_page on, the next page button and the description of each of their
+# items (asset id -> description in the JSON endpoint format, from the item elements) in a single WebDriver call
+INVENTORY_SNAPSHOT_SCRIPT = """
+const inventory = document.querySelector('div[id^="inventory_"][id$="_730_2"]');
+const pages = inventory ? Array.from(inventory.querySelectorAll("div.inventory_page")).slice(arguments[0]) : [];
+const next = document.getElementById("pagebtn_next");
+const descriptions = {};
+
+for (const page of pages) {
+    for (const element of page.querySelectorAll("div.item")) {
+        const description = element.rgItem && (element.rgItem.description || element.rgItem);
+
+        if (description && description.market_hash_name) {
+            descriptions[element.id.split("_")[2]] = {
+                market_hash_name: description.market_hash_name,
+                marketable: description.marketable,
+                tags: (description.tags || []).map(tag => ({category: tag.category,
+                                                            localized_tag_name: tag.localized_tag_name || tag.name})),
+            };
+        }
+    }
+}
+
+return {
+    html: (inventory ? `<div id="${inventory.id}">${pages.map(page => page.outerHTML).join("")}</div>` : "") +
+          (next ? next.outerHTML : ""),
+    descriptions: descriptions,
+    pages: arguments[0] + pages.length,
+};
+"""
+
+
+class InventoryUnavailableError(Exception):
+    """Raised when an inventory cannot be read from the JSON endpoint (private, missing or rate limited)"""
+
+
+def resolve_steam_id(inventory_url, base_url=STEAM_COMMUNITY_URL):
+    """
+
+    Retrieves the SteamID64 of an inventory URL
+
+    https://steamcommunity.com/profiles/<SteamID64>/inventory/ -> SteamID64 is taken from the URL
+    https://steamcommunity.com/id/<custom_url>/inventory/ -> SteamID64 is looked up from the profile XML
+
+    """
+
+    match = re.search(r'/(id|profiles)/([\w-]+)', inventory_url)
+
+    if match is None:
+        raise InventoryUnavailableError(f"Invalid inventory URL: {inventory_url}")
+
+    kind, value = match.groups()
+
+    if kind == "profiles":
+        return value
+
+    response = http_transport.get(f"{base_url}/id/{value}/?xml=1", timeout=10)
+    steam_id = re.search(r'<steamID64>(\d+)</steamID64>', response.text)
+
+    if not response.ok or steam_id is None:
+        raise InventoryUnavailableError(f"Could not resolve SteamID64 of {value}")
+
+    return steam_id.group(1)
+
+
+def fetch_inventory(steam_id, base_url=STEAM_COMMUNITY_URL, page_size=2000, bucket=None, max_retries=5,
+                    catalog=None):
+    """
+
+    Retrieves all CS2 items of an inventory from the JSON endpoint, in the same order as the inventory page
+
+    response format:
+    {
+        "assets": [{"appid": 730, "contextid": "2", "assetid": "...", "classid": "...", "instanceid": "...", ...}],
+        "descriptions": [{"classid": "...", "instanceid": "...", "market_hash_name": "...", "marketable": 1,
+                          "tags": [{"category": "Type", "localized_tag_name": "Rifle", ...}, ...], ...}],
+        "more_items": 1,
+        "last_assetid": "...",
+        "total_inventory_count": 1234,
+        "success": 1
+    }
+
+    bucket: optional TokenBucket shared between concurrent imports, pages are then requested at the bucket's rate and
+    rate limited pages are retried up to max_retries times, otherwise pages are half a second apart
+    catalog: optional ItemCatalog the items are described from (see parse_item)
+
+    :returns: list of item dictionaries (see parse_item)
+
+    """
+
+    items, start_assetid = [], None
+
+    while True:
+        params = {"l": "english", "count": page_size}
+
+        if start_assetid is not None:
+            params["start_assetid"] = start_assetid
+
+        try:
+            data = fetch_inventory_page(f"{base_url}/inventory/{steam_id}/730/2", params, bucket, max_retries)
+        except RateLimitedError:
+            raise InventoryUnavailableError("Rate Limited!")
+
+        if not data or not data.get("success"):
+            raise InventoryUnavailableError("The inventory is private or unavailable.")
+
+        descriptions = {(d["classid"], d["instanceid"]): d for d in data.get("descriptions", [])}
+
+        for asset in data.get("assets", []):
+            items.append(parse_item(asset, descriptions[(asset["classid"], asset["instanceid"])], catalog))
+
+        if not data.get("more_items"):
+            return items
+
+        start_assetid = data["last_assetid"]
+
+        if bucket is None:
+            time.sleep(.5)
+
+
+def fetch_inventory_page(url, params, bucket, max_retries):
+    """:returns: parsed JSON of one inventory page, None if the inventory is private or unavailable"""
+
+    for _ in range(max_retries + 1 if bucket is not None else 1):
+
+        if bucket is not None:
+            bucket.acquire()
+
+        response = http_transport.get(url, params=params, timeout=30)
+
+        if response.status_code == 429:
+            if bucket is None:
+                break
+
+            bucket.on_rate_limited(parse_retry_after(response))
+            continue
+
+        if bucket is not None:
+            bucket.on_success()
+
+        return response.json() if response.ok else None
+
+    raise RateLimitedError()
+
+
+def parse_item(asset, description, catalog=None):
+    """
+
+    Builds an item dictionary from an inventory asset and the metadata of its description
+
+    name: item name as seen on the Steam market without the wear e.g. "StatTrak™ AK-47 | Redline"
+    condition: wear of the item, empty if the item has none e.g. "Field-Tested"
+    item_type/rarity/quality: localized tag names e.g. "Rifle", "Classified", "StatTrak™"
+    colour: rarity colour of the item name e.g. "#CF6A32", None if it has none
+
+    catalog: optional ItemCatalog, the description tags are then only read for items it has not described yet and the
+    metadata of the others is taken from the catalog
+
+    """
+
+    market_hash_name = description["market_hash_name"]
+
+    if catalog is not None:
+        entry = catalog.describe_tags(market_hash_name, description.get("tags", []))
+    else:
+        entry = describe(description.get("tags", []))
+
+    name, condition = split_name(market_hash_name, entry["wear"])
+
+    return {
+        "assetid": asset["assetid"],
+        "name": name,
+        "condition": condition,
+        "marketable": description.get("marketable") == 1,
+        "item_type": entry["item_type"],
+        "rarity": entry["rarity"],
+        "quality": entry["quality"],
+        "colour": entry["colour"],
+    }
+
+
+def parse_inventory_snapshot(html, descriptions, seen=(), catalog=None):
+    """
+
+    Parses the CS2 items of an inventory page snapshot taken with INVENTORY_SNAPSHOT_SCRIPT
+
+    Items are read from the item slots of the snapshot's inventory pages, in page order, up to the first empty slot:
+    <div id="inventory_<SteamID64>_730_2">
+        <div class="inventory_page">
+            <div class="itemHolder"><div class="item app730 context2" id="730_2_<assetid>">...</div></div>
+            <div class="itemHolder disabled"></div>
+    ...
+    <a id="pagebtn_next" class="pagebtn disabled">
+
+    html: HTML of the snapshot, or of the whole inventory page
+    descriptions: dictionary of asset id -> description from the snapshot
+    seen: asset ids parsed from earlier snapshots, skipped
+    catalog: optional ItemCatalog the items are described from (see parse_item)
+
+    :returns: (list of item dictionaries (see parse_item), whether the last inventory page has been reached, number of
+        item slots which could not be read: items still loading, without an item element or description yet)
+
+    """
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    items, last_page, unread = [], False, 0
+
+    for holder in soup.select('div[id$="_730_2"] div.itemHolder'):
+        if "disabled" in holder.get("class", []):
+            last_page = True
+            break
+
+        element = holder.find("div", id=re.compile(r"^730_2_\d+$"))
+
+        # slots of items still loading have no item element or description yet, the caller takes the snapshot again
+        if element is None:
+            unread += 1
+            continue
+
+        assetid = element["id"][len("730_2_"):]
+
+        if assetid in seen:
+            continue
+
+        if assetid in descriptions:
+            items.append(parse_item({"assetid": assetid}, descriptions[assetid], catalog))
+        else:
+            unread += 1
+
+    next_button = soup.find(id="pagebtn_next")
+
+    return items, last_page or next_button is None or "disabled" in next_button.get("class", []), unread
@@ -0,0 +1,304 @@
+import os
+import shutil
+import pandas as pd
+from copy import copy
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell.cell import Cell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+# columns K-M hold the summary boxes (Expected Profit, Actual Profit, Last Price Check), not item data
+SUMMARY_COLUMNS = {11, 12, 13}
+
+
+def name_font(colour):
+    """:returns: font of an item name in a rarity colour given as aRGB hex e.g. FFD32CE6"""
+
+    return Font(color=colour, bold="yes", name="Open Sans", sz=10)
+
+
+def changed_rows(old_values, new_values):
+    """:returns: positions of the values that differ between two lists of column values, NaN/None compare equal"""
+
+    return [i for i, (old, new) in enumerate(zip(old_values, new_values))
+            if not (old == new or (pd.isnull(old) and pd.isnull(new)))]
+
+
+class PortfolioWorkbook:
+    """
+
+    Tracking spreadsheet parsed once with openpyxl
+
+    The item rows are exposed as a dataframe (df) built from the same parse, so the file is never read twice.
+    Changed values are written back to the existing cells, which keeps all cell formatting.
+
+    path: spreadsheet file
+    columns: dictionary of column header -> column number
+    number_formats: dictionary of column header -> number format applied to cells written in that column
+    rows: number of item rows (row 2 onwards up to the last row with an item name)
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.wb = load_workbook(path)
+        self.ws = self.wb.active
+
+        header = next(self.ws.iter_rows(min_row=1, max_row=1, values_only=True))
+        self.columns = {name: number for number, name in enumerate(header, start=1)
+                        if name is not None and number not in SUMMARY_COLUMNS}
+
+        data = [[row[number - 1] for number in self.columns.values()]
+                for row in self.ws.iter_rows(min_row=2, max_col=len(header), values_only=True)]
+
+        # trim trailing rows that only hold summary box labels
+        item_number = list(self.columns).index('Item')
+        while data and data[-1][item_number] is None:
+            data.pop()
+
+        self.number_formats = {}
+        self.rows = len(data)
+        self.df = pd.DataFrame(data, columns=list(self.columns))
+        self.original = self.df.copy()
+
+    def write_columns(self, df, names):
+        """
+
+        Writes the given dataframe columns back to the worksheet, only cells whose value changed are written
+
+        :returns: number of cells written
+
+        """
+
+        written = 0
+
+        for name in names:
+            column = self.columns[name]
+            # tolist() gives Python objects (float, Timestamp...) which openpyxl can write, unlike numpy scalars
+            new_values = df[name].tolist()
+            changed = changed_rows(self.original[name].tolist(), new_values)
+            number_format = self.number_formats.get(name)
+
+            for i in changed:
+                cell = self.ws.cell(row=i + 2, column=column)
+                cell.value = None if pd.isnull(new_values[i]) else new_values[i]
+
+                if number_format is not None:
+                    cell.number_format = number_format
+
+            self.original[name] = df[name].copy()
+            written += len(changed)
+
+        return written
+
+    def ensure_column(self, name, style_column, number_format=None):
+        """
+
+        Adds a column to the first free column after the summary boxes if the workbook does not have it yet
+
+        name: column header
+        style_column: existing column header whose header cell styling and width are copied
+        number_format: optional number format of the cells written in the column e.g. '0.00%'
+
+        """
+
+        if number_format is not None:
+            self.number_formats[name] = number_format
+
+        if name in self.columns:
+            return
+
+        number = max(*self.columns.values(), *SUMMARY_COLUMNS) + 1
+        style_cell = self.ws.cell(row=1, column=self.columns[style_column])
+
+        header = self.ws.cell(row=1, column=number, value=name)
+        header._style = copy(style_cell._style)
+        self.ws.column_dimensions[get_column_letter(number)].width = \
+            self.ws.column_dimensions[style_cell.column_letter].width
+
+        self.columns[name] = number
+        self.df[name] = None
+        self.original[name] = None
+
+    def set_cell(self, coordinate, value):
+        """Writes a summary box cell e.g. set_cell("L3", "01/01/2024 at 12:00")"""
+
+        self.ws[coordinate] = value
+
+    def row_writer(self, ws=None, start_row=2):
+        """:returns: RowWriter appending item rows to a sheet (the active sheet if ws is None) from start_row"""
+
+        return RowWriter(self, ws, start_row)
+
+    def column_letter(self, name):
+        """:returns: spreadsheet column letter of a column header"""
+
+        return get_column_letter(self.columns[name])
+
+    def save(self, *paths):
+        """
+
+        Saves the workbook to every path given, None paths are skipped
+
+        Each file is written to a temporary file first and then moved into place, so an interrupted save never leaves a
+        half written spreadsheet
+
+        """
+
+        for path in paths:
+            if path is not None:
+                tmp_path = f"{path}.tmp"
+                self.wb.save(tmp_path)
+                os.replace(tmp_path, path)
+
+
+class RowWriter:
+    """
+
+    Writes whole item rows into a PortfolioWorkbook sheet, styled like the header row, in one pass
+
+    Cell styles are registered once, one per column (taken from the header cell) and one per extra font used in a
+    column (e.g. rarity colours of item names), and every row reuses them. A row's cells are created with their value
+    and style directly instead of being created empty, styled by copying and then written.
+
+    workbook: PortfolioWorkbook whose column headers and header styling are used
+    ws: sheet to write to, the workbook's active sheet if None
+    start_row: first row written
+    styled_columns: number of leading columns styled like their header cell, later columns only get the number format
+        set for them in the workbook (PortfolioWorkbook.number_formats)
+    write_only: stream the rows into a new write-only workbook instead (for very large inventories). The template's
+        rows (header and summary boxes), column widths, frozen panes and conditional formatting are copied over, rows
+        are written in order from start_row and the result is saved with save()
+
+    """
+
+    def __init__(self, workbook, ws=None, start_row=2, styled_columns=10, write_only=False):
+        self.columns = workbook.columns
+        self.number_formats = workbook.number_formats
+        self.template = ws or workbook.ws
+        self.styled_columns = styled_columns
+        self.write_only = write_only
+        self.styles = {}
+        self.column_styles = {}
+        self.next_row = start_row
+
+        if not write_only:
+            self.wb, self.ws = workbook.wb, self.template
+            return
+
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(self.template.title)
+        self.ws.freeze_panes = self.template.freeze_panes
+
+        for letter, dimension in self.template.column_dimensions.items():
+            self.ws.column_dimensions[letter].width = dimension.width
+
+        for formatting in self.template.conditional_formatting:
+            for rule in formatting.rules:
+                self.ws.conditional_formatting.add(str(formatting.sqref), rule)
+
+        # template cells still to be written: row -> list of cells
+        self.template_rows = {row[0].row: [cell for cell in row if cell.value is not None or cell.has_style]
+                              for row in self.template.iter_rows()}
+        self.ws.append(self.row_list(self.template_row(1)))
+
+    def style(self, cell, font=None):
+        """:returns: registered style of a template cell, with its font replaced by font if given"""
+
+        key = (tuple(cell._style), font)
+
+        if key not in self.styles:
+            # a scratch cell which is never added to the sheet registers the style in the workbook written to
+            scratch = Cell(self.ws)
+
+            if self.write_only:
+                for attribute in ("font", "fill", "border", "alignment", "protection", "number_format"):
+                    setattr(scratch, attribute, copy(getattr(cell, attribute)))
+            else:
+                scratch._style = copy(cell._style)
+
+            if font is not None:
+                scratch.font = font
+
+            self.styles[key] = scratch._style
+
+        return self.styles[key]
+
+    def template_row(self, row):
+        """:returns: dictionary of column -> cell of a template row converted for the write-only workbook"""
+
+        return {cell.column: Cell(self.ws, value=cell.value, style_array=self.style(cell))
+                for cell in self.template_rows.pop(row, [])}
+
+    @staticmethod
+    def row_list(cells):
+        """:returns: list of a row's cells in column order as appended to a write-only sheet, None for gaps"""
+
+        return [cells.get(column) for column in range(1, max(cells, default=0) + 1)]
+
+    def write_row(self, values, fonts=None):
+        """
+
+        Writes the next row
+
+        values: dictionary of column header -> value, formulas are given as strings e.g. "=F2-E2"
+        fonts: dictionary of column header -> Font replacing the header font in that column
+
+        :returns: row number written
+
+        """
+
+        row = self.next_row
+        self.next_row += 1
+        fonts = fonts or {}
+        cells = {}
+
+        for name, value in values.items():
+            column = self.columns[name]
+            style = None
+
+            if column <= self.styled_columns:
+                key = (column, fonts.get(name))
+
+                if key not in self.column_styles:
+                    self.column_styles[key] = self.style(self.template.cell(row=1, column=column), key[1])
+                style = self.column_styles[key]
+
+            elif name in self.number_formats:
+                key = (column, None)
+
+                if key not in self.column_styles:
+                    scratch = Cell(self.ws)
+                    scratch.number_format = self.number_formats[name]
+                    self.column_styles[key] = scratch._style
+                style = self.column_styles[key]
+
+            cells[column] = Cell(self.ws, row=row, column=column, value=value, style_array=style)
+
+        if not self.write_only:
+            for cell in cells.values():
+                self.ws._add_cell(cell)
+            return row
+
+        self.ws.append(self.row_list(self.template_row(row) | cells))
+
+        return row
+
+    def save(self, *paths):
+        """Saves a write-only workbook (once) to every path given, None paths are skipped"""
+
+        # summary box rows below the last item row
+        for row in sorted(self.template_rows):
+            while self.next_row < row:
+                self.ws.append([])
+                self.next_row += 1
+            self.ws.append(self.row_list(self.template_row(row)))
+            self.next_row += 1
+
+        paths = [path for path in paths if path is not None]
+        tmp_path = f"{paths[0]}.tmp"
+        self.wb.save(tmp_path)
+
+        for path in paths[1:]:
+            shutil.copyfile(tmp_path, path)
+        os.replace(tmp_path, paths[0])